@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass, field
 from typing import TypedDict, Union, Literal, Generic, TypeVar
 
@@ -54,12 +55,32 @@ class BaseVectorStorage(StorageNameSpace):
     async def query(self, query: str, top_k: int) -> list[dict]:
         raise NotImplementedError
 
+    async def query_many(self, queries: list[str], top_k: int) -> list[list[dict]]:
+        """Run several queries, return one result list per query in order.
+        Backends override this to embed and search all queries at once.
+        """
+        return list(await asyncio.gather(*[self.query(q, top_k) for q in queries]))
+
     async def upsert(self, data: dict[str, dict]):
         """Use 'content' field from value for embedding, use key as id.
         If embedding_func is None, use 'embedding' field from value
         """
         raise NotImplementedError
 
+    async def delete_entities(self, entity_names: list[str]):
+        """Delete the records of several entities.
+        Backends override this to delete them all in one pass.
+        """
+        for entity_name in entity_names:
+            await self.delete_entity(entity_name)
+
+    async def delete_relations(self, entity_names: list[str]):
+        """Delete the records linked to several entities.
+        Backends override this to delete them all in one pass.
+        """
+        for entity_name in entity_names:
+            await self.delete_relation(entity_name)
+
 
 @dataclass
 class BaseKVStorage(Generic[T], StorageNameSpace):
@@ -83,6 +104,10 @@ class BaseKVStorage(Generic[T], StorageNameSpace):
     async def upsert(self, data: dict[str, T]):
         raise NotImplementedError
 
+    async def delete(self, ids: list[str]):
+        """Remove the given keys, unknown keys are ignored"""
+        raise NotImplementedError
+
     async def drop(self):
         raise NotImplementedError
 
@@ -116,6 +141,30 @@ class BaseGraphStorage(StorageNameSpace):
     ) -> Union[list[tuple[str, str]], None]:
         raise NotImplementedError
 
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        """Batch get_node, results follow the order of node_ids.
+        Backends override the batch methods to answer in a few round trips.
+        """
+        return list(await asyncio.gather(*[self.get_node(n) for n in node_ids]))
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        return list(await asyncio.gather(*[self.node_degree(n) for n in node_ids]))
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return list(await asyncio.gather(*[self.get_edge(s, t) for s, t in edge_pairs]))
+
+    async def edge_degrees(self, edge_pairs: list[tuple[str, str]]) -> list[int]:
+        node_ids = list(dict.fromkeys(n for pair in edge_pairs for n in pair))
+        degrees = dict(zip(node_ids, await self.node_degrees(node_ids)))
+        return [(degrees[s] or 0) + (degrees[t] or 0) for s, t in edge_pairs]
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[Union[list[tuple[str, str]], None]]:
+        return list(await asyncio.gather(*[self.get_node_edges(n) for n in node_ids]))
+
     async def upsert_node(self, node_id: str, node_data: dict[str, str]):
         raise NotImplementedError
 
@@ -124,6 +173,14 @@ class BaseGraphStorage(StorageNameSpace):
     ):
         raise NotImplementedError
 
+    async def upsert_nodes(self, nodes: list[tuple[str, dict[str, str]]]):
+        """Batch upsert_node for (node_id, node_data) pairs"""
+        await asyncio.gather(*[self.upsert_node(n, data) for n, data in nodes])
+
+    async def upsert_edges(self, edges: list[tuple[str, str, dict[str, str]]]):
+        """Batch upsert_edge for (source_node_id, target_node_id, edge_data)"""
+        await asyncio.gather(*[self.upsert_edge(s, t, data) for s, t, data in edges])
+
     async def delete_node(self, node_id: str):
         raise NotImplementedError
 
@@ -11,7 +11,7 @@ from .llm import (
     openai_embedding,
 )
 from .operate import (
-    chunking_by_token_size,
+    chunking_by_token_size_batch,
     extract_entities,
     # local_query,global_query,hybrid_query,
     kg_query
@@ -21,6 +21,9 @@ from .utils import (
     EmbeddingFunc,
     compute_mdhash_id,
     limit_async_func_call,
+    limit_async_func_rate,
+    count_llm_call_tokens,
+    count_embedding_call_tokens,
     convert_response_to_json,
     logger,
     set_logger,
@@ -35,8 +38,10 @@ from .base import (
 
 from .storage import (
     JsonKVStorage,
+    SQLiteKVStorage,
     NanoVectorDBStorage,
     NetworkXStorage,
+    CSRGraphStorage,
 )
 
 # future KG integrations
@@ -78,6 +83,7 @@ MongoKVStorage = lazy_external_import(".kg.mongo_impl", "MongoKVStorage")
 ChromaVectorDBStorage = lazy_external_import(".kg.chroma_impl", "ChromaVectorDBStorage")
 TiDBKVStorage = lazy_external_import(".kg.tidb_impl", "TiDBKVStorage")
 TiDBVectorDBStorage = lazy_external_import(".kg.tidb_impl", "TiDBVectorDBStorage")
+HNSWVectorDBStorage = lazy_external_import(".kg.hnsw_impl", "HNSWVectorDBStorage")
 
 
 def always_get_an_event_loop() -> asyncio.AbstractEventLoop:
@@ -116,6 +122,8 @@ class HyperGraphRAG:
             "enabled": False,
             "similarity_threshold": 0.95,
             "use_llm_check": False,
+            # past this many cached queries per mode, look up with hnswlib
+            "ann_threshold": 10000,
         }
     )
     kv_storage: str = field(default="JsonKVStorage")
@@ -129,9 +137,22 @@ class HyperGraphRAG:
     chunk_token_size: int = 1200
     chunk_overlap_token_size: int = 100
     tiktoken_model_name: str = "gpt-4o-mini"
+    # documents chunked per batch, embedding of a batch starts while the next
+    # one is chunked
+    chunking_batch_size: int = 32
+    # bound of the queues between the chunking, extraction, graph merge and
+    # vector upsert stages of an insert
+    pipeline_queue_size: int = 64
+    # merged entities and hyperedges held back before one vector upsert, an
+    # upsert can cost a pass over the whole store (NanoVectorDB)
+    pipeline_vdb_flush_size: int = 4096
 
     # entity extraction
     entity_extract_max_gleaning: int = 2
+    # stream extraction replies and parse records as they arrive, a chunk is
+    # still merged once all its rounds are done. Needs an llm_model_func that
+    # accepts stream=True (openai and ollama backends)
+    entity_extract_stream: bool = False
     entity_summary_to_max_tokens: int = 500
 
     # node embedding
@@ -151,16 +172,25 @@ class HyperGraphRAG:
     embedding_func: EmbeddingFunc = field(default_factory=lambda: openai_embedding)
     embedding_batch_num: int = 32
     embedding_func_max_async: int = 16
+    # requests / tokens per minute quotas of the provider, 0 means unlimited
+    embedding_func_rpm: int = 0
+    embedding_func_tpm: int = 0
 
     # LLM
     llm_model_func: callable = gpt_4o_mini_complete  # hf_model_complete#
     llm_model_name: str = "meta-llama/Llama-3.2-1B-Instruct"  #'meta-llama/Llama-3.2-1B'#'google/gemma-2-2b-it'
     llm_model_max_token_size: int = 32768
     llm_model_max_async: int = 16
+    llm_model_rpm: int = 0
+    llm_model_tpm: int = 0
     llm_model_kwargs: dict = field(default_factory=dict)
 
     # storage
+    # e.g. {"journal": True} for an append-only JsonKVStorage
+    kv_storage_cls_kwargs: dict = field(default_factory=dict)
     vector_db_storage_cls_kwargs: dict = field(default_factory=dict)
+    # e.g. {"batch_size": 1000} rows per transaction for batched graph upserts
+    graph_storage_cls_kwargs: dict = field(default_factory=dict)
 
     enable_llm_cache: bool = True
 
@@ -202,7 +232,22 @@ class HyperGraphRAG:
             else None
         )
         self.embedding_func = limit_async_func_call(self.embedding_func_max_async)(
-            self.embedding_func
+            limit_async_func_rate(
+                self.embedding_func_rpm,
+                self.embedding_func_tpm,
+                count_embedding_call_tokens,
+            )(self.embedding_func)
+        )
+
+        # per-chunk extraction results of an unfinished insert, journaled so
+        # each finished chunk is durable right away
+        self.extraction_checkpoint = JsonKVStorage(
+            namespace="extraction_checkpoint",
+            global_config={
+                **asdict(self),
+                "kv_storage_cls_kwargs": {"journal": True},
+            },
+            embedding_func=None,
         )
 
         self.full_docs = self.key_string_value_json_storage_cls(
@@ -231,7 +276,7 @@ class HyperGraphRAG:
             namespace="hyperedges",
             global_config=asdict(self),
             embedding_func=self.embedding_func,
-            meta_fields={"hyperedge_name"},
+            meta_fields={"hyperedge_name", "src_id", "tgt_id"},
         )
         self.chunks_vdb = self.vector_db_storage_cls(
             namespace="chunks",
@@ -240,10 +285,14 @@ class HyperGraphRAG:
         )
 
         self.llm_model_func = limit_async_func_call(self.llm_model_max_async)(
-            partial(
-                self.llm_model_func,
-                hashing_kv=self.llm_response_cache,
-                **self.llm_model_kwargs,
+            limit_async_func_rate(
+                self.llm_model_rpm, self.llm_model_tpm, count_llm_call_tokens
+            )(
+                partial(
+                    self.llm_model_func,
+                    hashing_kv=self.llm_response_cache,
+                    **self.llm_model_kwargs,
+                )
             )
         )
 
@@ -251,6 +300,7 @@ class HyperGraphRAG:
         return {
             # kv storage
             "JsonKVStorage": JsonKVStorage,
+            "SQLiteKVStorage": SQLiteKVStorage,
             "OracleKVStorage": OracleKVStorage,
             "MongoKVStorage": MongoKVStorage,
             "TiDBKVStorage": TiDBKVStorage,
@@ -260,8 +310,10 @@ class HyperGraphRAG:
             "MilvusVectorDBStorge": MilvusVectorDBStorge,
             "ChromaVectorDBStorage": ChromaVectorDBStorage,
             "TiDBVectorDBStorage": TiDBVectorDBStorage,
+            "HNSWVectorDBStorage": HNSWVectorDBStorage,
             # graph storage
             "NetworkXStorage": NetworkXStorage,
+            "CSRGraphStorage": CSRGraphStorage,
             "Neo4JStorage": Neo4JStorage,
             "OracleGraphStorage": OracleGraphStorage,
             # "ArangoDBStorage": ArangoDBStorage
@@ -290,50 +342,80 @@ class HyperGraphRAG:
             logger.info(f"[New Docs] inserting {len(new_docs)} docs")
 
             inserting_chunks = {}
-            for doc_key, doc in tqdm_async(
-                new_docs.items(), desc="Chunking documents", unit="doc"
-            ):
-                chunks = {
-                    compute_mdhash_id(dp["content"], prefix="chunk-"): {
-                        **dp,
-                        "full_doc_id": doc_key,
-                    }
-                    for dp in chunking_by_token_size(
-                        doc["content"],
+            chunk_upserts = []
+            doc_keys = list(new_docs.keys())
+
+            async def _chunk_batches():
+                for start in tqdm_async(
+                    range(0, len(doc_keys), self.chunking_batch_size),
+                    desc="Chunking documents",
+                    unit="batch",
+                ):
+                    batch_keys = doc_keys[start : start + self.chunking_batch_size]
+                    # tokenize off the event loop, earlier chunks keep moving
+                    # through embedding and extraction
+                    batch_chunks = await asyncio.to_thread(
+                        chunking_by_token_size_batch,
+                        [new_docs[doc_key]["content"] for doc_key in batch_keys],
                         overlap_token_size=self.chunk_overlap_token_size,
                         max_token_size=self.chunk_token_size,
                         tiktoken_model=self.tiktoken_model_name,
                     )
-                }
-                inserting_chunks.update(chunks)
-            _add_chunk_keys = await self.text_chunks.filter_keys(
-                list(inserting_chunks.keys())
-            )
-            inserting_chunks = {
-                k: v for k, v in inserting_chunks.items() if k in _add_chunk_keys
-            }
+                    chunks = {
+                        compute_mdhash_id(dp["content"], prefix="chunk-"): {
+                            **dp,
+                            "full_doc_id": doc_key,
+                        }
+                        for doc_key, doc_chunks in zip(batch_keys, batch_chunks)
+                        for dp in doc_chunks
+                    }
+                    _add_chunk_keys = await self.text_chunks.filter_keys(
+                        list(chunks.keys())
+                    )
+                    # text_chunks is only written at the end, a chunk repeated
+                    # in an earlier batch is still unknown to it
+                    chunks = {
+                        k: v
+                        for k, v in chunks.items()
+                        if k in _add_chunk_keys and k not in inserting_chunks
+                    }
+                    if not chunks:
+                        continue
+                    chunk_upserts.append(
+                        asyncio.create_task(self.chunks_vdb.upsert(chunks))
+                    )
+                    inserting_chunks.update(chunks)
+                    yield chunks
+
+            try:
+                logger.info("[Entity Extraction]...")
+                maybe_new_kg = await extract_entities(
+                    _chunk_batches(),
+                    knowledge_graph_inst=self.chunk_entity_relation_graph,
+                    entity_vdb=self.entities_vdb,
+                    hyperedge_vdb=self.hyperedges_vdb,
+                    global_config=asdict(self),
+                    checkpoint_kv=self.extraction_checkpoint,
+                )
+                await asyncio.gather(*chunk_upserts)
+            finally:
+                for task in chunk_upserts:
+                    task.cancel()
             if not len(inserting_chunks):
                 logger.warning("All chunks are already in the storage")
                 return
-            logger.info(f"[New Chunks] inserting {len(inserting_chunks)} chunks")
-
-            await self.chunks_vdb.upsert(inserting_chunks)
-
-            logger.info("[Entity Extraction]...")
-            maybe_new_kg = await extract_entities(
-                inserting_chunks,
-                knowledge_graph_inst=self.chunk_entity_relation_graph,
-                entity_vdb=self.entities_vdb,
-                hyperedge_vdb=self.hyperedges_vdb,
-                global_config=asdict(self),
-            )
+            logger.info(f"[New Chunks] inserted {len(inserting_chunks)} chunks")
             if maybe_new_kg is None:
                 logger.warning("No new hyperedges and entities found")
+                # every chunk was extracted, there is nothing to resume either
+                await self.extraction_checkpoint.drop()
                 return
             self.chunk_entity_relation_graph = maybe_new_kg
 
             await self.full_docs.upsert(new_docs)
             await self.text_chunks.upsert(inserting_chunks)
+            # the insert is complete, nothing left to resume
+            await self.extraction_checkpoint.drop()
         finally:
             if update_storage:
                 await self._insert_done()
@@ -343,6 +425,7 @@ class HyperGraphRAG:
         for storage_inst in [
             self.full_docs,
             self.text_chunks,
+            self.extraction_checkpoint,
             self.llm_response_cache,
             self.entities_vdb,
             self.hyperedges_vdb,
@@ -536,6 +619,27 @@ class HyperGraphRAG:
         except Exception as e:
             logger.error(f"Error while deleting entity '{entity_name}': {e}")
 
+    def delete_by_entities(self, entity_names: list[str]):
+        loop = always_get_an_event_loop()
+        return loop.run_until_complete(self.adelete_by_entities(entity_names))
+
+    async def adelete_by_entities(self, entity_names: list[str]):
+        """Delete several entities, persisting the storages once at the end"""
+        entity_names = [f'"{entity_name.upper()}"' for entity_name in entity_names]
+
+        try:
+            await self.entities_vdb.delete_entities(entity_names)
+            await self.hyperedges_vdb.delete_relations(entity_names)
+            for entity_name in entity_names:
+                await self.chunk_entity_relation_graph.delete_node(entity_name)
+
+            logger.info(
+                f"Entities {entity_names} and their relationships have been deleted."
+            )
+            await self._delete_by_entity_done()
+        except Exception as e:
+            logger.error(f"Error while deleting entities {entity_names}: {e}")
+
     async def _delete_by_entity_done(self):
         tasks = []
         for storage_inst in [
@@ -167,6 +167,38 @@ class ChromaVectorDBStorage(BaseVectorStorage):
             logger.error(f"Error during ChromaDB query: {str(e)}")
             raise
 
+    async def query_many(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        if not queries:
+            return []
+        try:
+            embeddings = await self.embedding_func(queries)
+
+            # One request for all queries, results come back per query
+            results = self._collection.query(
+                query_embeddings=embeddings.tolist(),
+                n_results=top_k * 2,  # Request more results to allow for filtering
+                include=["metadatas", "distances", "documents"],
+            )
+
+            return [
+                [
+                    {
+                        "id": ids[i],
+                        "distance": 1 - results["distances"][q][i],
+                        "content": results["documents"][q][i],
+                        **results["metadatas"][q][i],
+                    }
+                    for i in range(len(ids))
+                    if (1 - results["distances"][q][i])
+                    >= self.cosine_better_than_threshold
+                ][:top_k]
+                for q, ids in enumerate(results["ids"])
+            ]
+
+        except Exception as e:
+            logger.error(f"Error during ChromaDB batch query: {str(e)}")
+            raise
+
     async def index_done_callback(self):
         # ChromaDB handles persistence automatically
         pass
@@ -0,0 +1,209 @@
+import asyncio
+import os
+from dataclasses import dataclass
+
+import hnswlib
+import numpy as np
+from tqdm.asyncio import tqdm as tqdm_async
+
+from ..base import BaseVectorStorage
+from ..utils import compute_mdhash_id, load_json, logger, write_json
+
+
+@dataclass
+class HNSWVectorDBStorage(BaseVectorStorage):
+    """Local vector storage on an hnswlib index.
+
+    Vectors live in ``vdb_{namespace}.hnsw.bin`` and the id/label mapping and
+    meta fields in ``vdb_{namespace}.hnsw.json``. Deletes only mark the label,
+    and later inserts reuse the marked slots.
+    """
+
+    cosine_better_than_threshold: float = 0.2
+
+    def __post_init__(self):
+        config = self.global_config.get("vector_db_storage_cls_kwargs", {})
+        self._M = config.get("M", 16)
+        self._ef_construction = config.get("ef_construction", 200)
+        self._ef_search = config.get("ef_search", 64)
+        self._initial_max_elements = config.get("max_elements", 1024)
+        self._max_batch_size = self.global_config["embedding_batch_num"]
+        self.cosine_better_than_threshold = self.global_config.get(
+            "cosine_better_than_threshold", self.cosine_better_than_threshold
+        )
+
+        working_dir = self.global_config["working_dir"]
+        self._index_file_name = os.path.join(
+            working_dir, f"vdb_{self.namespace}.hnsw.bin"
+        )
+        self._meta_file_name = os.path.join(
+            working_dir, f"vdb_{self.namespace}.hnsw.json"
+        )
+        self._dim = self.embedding_func.embedding_dim
+        self._index = hnswlib.Index(space="cosine", dim=self._dim)
+
+        meta = load_json(self._meta_file_name)
+        if meta is not None and os.path.exists(self._index_file_name):
+            self._labels: dict[str, int] = meta["labels"]
+            self._data: dict[str, dict] = meta["data"]
+            self._next_label: int = meta["next_label"]
+            self._index.load_index(
+                self._index_file_name,
+                max_elements=max(meta["max_elements"], self._initial_max_elements),
+                allow_replace_deleted=True,
+            )
+        else:
+            self._labels, self._data, self._next_label = {}, {}, 0
+            self._index.init_index(
+                max_elements=self._initial_max_elements,
+                M=self._M,
+                ef_construction=self._ef_construction,
+                allow_replace_deleted=True,
+            )
+        self._index.set_ef(self._ef_search)
+        self._ids = {label: id_ for id_, label in self._labels.items()}
+        logger.info(f"Load HNSW VDB {self.namespace} with {len(self._labels)} data")
+
+    async def upsert(self, data: dict[str, dict]):
+        logger.info(f"Inserting {len(data)} vectors to {self.namespace}")
+        if not len(data):
+            logger.warning("You insert an empty data to vector DB")
+            return []
+        contents = [v["content"] for v in data.values()]
+        batches = [
+            contents[i : i + self._max_batch_size]
+            for i in range(0, len(contents), self._max_batch_size)
+        ]
+
+        async def wrapped_task(batch):
+            result = await self.embedding_func(batch)
+            pbar.update(1)
+            return result
+
+        embedding_tasks = [wrapped_task(batch) for batch in batches]
+        pbar = tqdm_async(
+            total=len(embedding_tasks), desc="Generating embeddings", unit="batch"
+        )
+        embeddings_list = await asyncio.gather(*embedding_tasks)
+        embeddings = np.concatenate(embeddings_list)
+        if len(embeddings) != len(data):
+            # sometimes the embedding is not returned correctly. just log it.
+            logger.error(
+                f"embedding is not 1-1 with data, {len(embeddings)} != {len(data)}"
+            )
+            return
+
+        # Existing ids are updated in place, new ones take fresh labels that
+        # hnswlib places into slots freed by mark_deleted. The two must not
+        # share a call, replace_deleted would put an existing label into a
+        # freed slot and leave its old vector searchable
+        embeddings = embeddings.astype(np.float32)
+        existing_rows, existing_labels, new_rows, new_labels = [], [], [], []
+        for row, k in enumerate(data):
+            if k in self._labels:
+                existing_rows.append(row)
+                existing_labels.append(self._labels[k])
+                continue
+            self._labels[k] = self._next_label
+            self._ids[self._next_label] = k
+            new_rows.append(row)
+            new_labels.append(self._next_label)
+            self._next_label += 1
+        needed = max(self._index.get_current_count(), len(self._labels))
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        if existing_rows:
+            self._index.add_items(
+                embeddings[existing_rows],
+                np.array(existing_labels),
+                replace_deleted=False,
+            )
+        if new_rows:
+            self._index.add_items(
+                embeddings[new_rows], np.array(new_labels), replace_deleted=True
+            )
+        for k, v in data.items():
+            self._data[k] = {k1: v1 for k1, v1 in v.items() if k1 in self.meta_fields}
+        return list(data.keys())
+
+    async def query(self, query: str, top_k=5):
+        return (await self.query_many([query], top_k))[0]
+
+    async def query_many(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        if not queries:
+            return []
+        if not self._labels:
+            return [[] for _ in queries]
+        embeddings = await self.embedding_func(queries)
+        labels, distances = self._index.knn_query(
+            embeddings.astype(np.float32), k=min(top_k, len(self._labels))
+        )
+        results = []
+        for row_labels, row_distances in zip(labels, distances):
+            results.append([])
+            for label, distance in zip(row_labels, row_distances):
+                similarity = 1 - float(distance)
+                if similarity < self.cosine_better_than_threshold:
+                    continue
+                id_ = self._ids[int(label)]
+                results[-1].append(
+                    {**self._data[id_], "id": id_, "distance": similarity}
+                )
+        return results
+
+    def _delete(self, ids: list[str]):
+        for id_ in ids:
+            label = self._labels.pop(id_)
+            self._ids.pop(label)
+            self._data.pop(id_, None)
+            self._index.mark_deleted(label)
+
+    async def delete_entity(self, entity_name: str):
+        try:
+            entity_id = compute_mdhash_id(entity_name, prefix="ent-")
+
+            if entity_id in self._labels:
+                self._delete([entity_id])
+                logger.info(f"Entity {entity_name} have been deleted.")
+            else:
+                logger.info(f"No entity found with name {entity_name}.")
+        except Exception as e:
+            logger.error(f"Error while deleting entity {entity_name}: {e}")
+
+    async def delete_relation(self, entity_name: str):
+        try:
+            ids_to_delete = [
+                id_
+                for id_, dp in self._data.items()
+                if dp.get("src_id") == entity_name or dp.get("tgt_id") == entity_name
+            ]
+
+            if ids_to_delete:
+                self._delete(ids_to_delete)
+                logger.info(
+                    f"All relations related to entity {entity_name} have been deleted."
+                )
+            else:
+                logger.info(f"No relations found for entity {entity_name}.")
+        except Exception as e:
+            logger.error(
+                f"Error while deleting relations for entity {entity_name}: {e}"
+            )
+
+    async def index_done_callback(self):
+        # Write both files aside first so a crash never pairs a new index
+        # with stale labels
+        tmp_index_file_name = self._index_file_name + ".tmp"
+        tmp_meta_file_name = self._meta_file_name + ".tmp"
+        self._index.save_index(tmp_index_file_name)
+        write_json(
+            {
+                "labels": self._labels,
+                "data": self._data,
+                "next_label": self._next_label,
+                "max_elements": self._index.get_max_elements(),
+            },
+            tmp_meta_file_name,
+        )
+        os.replace(tmp_index_file_name, self._index_file_name)
+        os.replace(tmp_meta_file_name, self._meta_file_name)
@@ -88,3 +88,19 @@ class MilvusVectorDBStorge(BaseVectorStorage):
             {**dp["entity"], "id": dp["id"], "distance": dp["distance"]}
             for dp in results[0]
         ]
+
+    async def query_many(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        if not queries:
+            return []
+        embeddings = await self.embedding_func(queries)
+        results = self._client.search(
+            collection_name=self.namespace,
+            data=embeddings,
+            limit=top_k,
+            output_fields=list(self.meta_fields),
+            search_params={"metric_type": "COSINE", "params": {"radius": 0.2}},
+        )
+        return [
+            [{**dp["entity"], "id": dp["id"], "distance": dp["distance"]} for dp in hits]
+            for hits in results
+        ]
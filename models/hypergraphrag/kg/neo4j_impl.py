@@ -23,6 +23,9 @@ from tenacity import (
 
 @dataclass
 class Neo4JStorage(BaseGraphStorage):
+    # items per UNION ALL statement in the batch lookups
+    _union_batch_size = 100
+
     @staticmethod
     def load_nx_graph(file_name):
         print("no preloading of graph with neo4j in production")
@@ -47,6 +50,15 @@ class Neo4JStorage(BaseGraphStorage):
         self._node_embed_algorithms = {
             "node2vec": self._node2vec_embed,
         }
+        storage_kwargs = self.global_config.get("graph_storage_cls_kwargs", {})
+        self._upsert_batch_size = storage_kwargs.get("batch_size", 1000)
+        # "label" keeps one label per entity; "property" puts every node
+        # under node_label with a unique, indexed id property
+        self._node_model = storage_kwargs.get("node_model", "label")
+        if self._node_model not in ("label", "property"):
+            raise ValueError(f"Unknown Neo4j node_model {self._node_model!r}")
+        self._node_label = storage_kwargs.get("node_label", "Entity").replace("`", "``")
+        self._schema_ready = False
 
     async def close(self):
         if self._driver:
@@ -60,14 +72,61 @@ class Neo4JStorage(BaseGraphStorage):
     async def index_done_callback(self):
         print("KG successfully indexed.")
 
+    @property
+    def _property_model(self) -> bool:
+        return self._node_model == "property"
+
+    async def _ensure_schema(self):
+        """Create the ``id`` uniqueness constraint of the property model.
+
+        Runs once per storage before its first query; the constraint also
+        backs the index that the ``{id: ...}`` lookups seek on.
+        """
+        if not self._property_model or self._schema_ready:
+            return
+        async with self._driver_lock:
+            if self._schema_ready:
+                return
+            async with self._driver.session() as session:
+                result = await session.run(
+                    f"CREATE CONSTRAINT `{self._node_label}_id_unique` IF NOT EXISTS "
+                    f"FOR (n:`{self._node_label}`) REQUIRE n.id IS UNIQUE"
+                )
+                await result.consume()
+            self._schema_ready = True
+
+    @staticmethod
+    def _label(node_id: str) -> str:
+        return node_id.strip('"').replace("`", "``")
+
+    def _node_match(self, var: str, node_id: str) -> tuple[str, dict]:
+        """Pattern and parameters matching one node in the active node model."""
+        if self._property_model:
+            return (
+                f"({var}:`{self._node_label}` {{id: ${var}_id}})",
+                {f"{var}_id": node_id.strip('"')},
+            )
+        return f"({var}:`{self._label(node_id)}`)", {}
+
+    def _node_name(self, var: str) -> str:
+        """Expression returning the entity name of a matched node."""
+        if self._property_model:
+            return f"{var}.id"
+        return f"labels({var})[0]"
+
+    def _node_properties(self, node) -> dict:
+        node_dict = dict(node)
+        if self._property_model:
+            node_dict.pop("id", None)
+        return node_dict
+
     async def has_node(self, node_id: str) -> bool:
-        entity_name_label = node_id.strip('"')
+        await self._ensure_schema()
+        node, params = self._node_match("n", node_id)
 
         async with self._driver.session() as session:
-            query = (
-                f"MATCH (n:`{entity_name_label}`) RETURN count(n) > 0 AS node_exists"
-            )
-            result = await session.run(query)
+            query = f"MATCH {node} RETURN count(n) > 0 AS node_exists"
+            result = await session.run(query, **params)
             single_result = await result.single()
             logger.debug(
                 f'{inspect.currentframe().f_code.co_name}:query:{query}:result:{single_result["node_exists"]}'
@@ -75,15 +134,13 @@ class Neo4JStorage(BaseGraphStorage):
             return single_result["node_exists"]
 
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
-        entity_name_label_source = source_node_id.strip('"')
-        entity_name_label_target = target_node_id.strip('"')
+        await self._ensure_schema()
+        source, source_params = self._node_match("a", source_node_id)
+        target, target_params = self._node_match("b", target_node_id)
 
         async with self._driver.session() as session:
-            query = (
-                f"MATCH (a:`{entity_name_label_source}`)-[r]-(b:`{entity_name_label_target}`) "
-                "RETURN COUNT(r) > 0 AS edgeExists"
-            )
-            result = await session.run(query)
+            query = f"MATCH {source}-[r]-{target} RETURN COUNT(r) > 0 AS edgeExists"
+            result = await session.run(query, **source_params, **target_params)
             single_result = await result.single()
             logger.debug(
                 f'{inspect.currentframe().f_code.co_name}:query:{query}:result:{single_result["edgeExists"]}'
@@ -91,14 +148,14 @@ class Neo4JStorage(BaseGraphStorage):
             return single_result["edgeExists"]
 
     async def get_node(self, node_id: str) -> Union[dict, None]:
+        await self._ensure_schema()
+        node, params = self._node_match("n", node_id)
         async with self._driver.session() as session:
-            entity_name_label = node_id.strip('"')
-            query = f"MATCH (n:`{entity_name_label}`) RETURN n"
-            result = await session.run(query)
+            query = f"MATCH {node} RETURN n"
+            result = await session.run(query, **params)
             record = await result.single()
             if record:
-                node = record["n"]
-                node_dict = dict(node)
+                node_dict = self._node_properties(record["n"])
                 logger.debug(
                     f"{inspect.currentframe().f_code.co_name}: query: {query}, result: {node_dict}"
                 )
@@ -106,14 +163,15 @@ class Neo4JStorage(BaseGraphStorage):
             return None
 
     async def node_degree(self, node_id: str) -> int:
-        entity_name_label = node_id.strip('"')
+        await self._ensure_schema()
+        node, params = self._node_match("n", node_id)
 
         async with self._driver.session() as session:
             query = f"""
-                MATCH (n:`{entity_name_label}`)
+                MATCH {node}
                 RETURN COUNT{{ (n)--() }} AS totalEdgeCount
             """
-            result = await session.run(query)
+            result = await session.run(query, **params)
             record = await result.single()
             if record:
                 edge_count = record["totalEdgeCount"]
@@ -143,29 +201,27 @@ class Neo4JStorage(BaseGraphStorage):
     async def get_edge(
         self, source_node_id: str, target_node_id: str
     ) -> Union[dict, None]:
-        entity_name_label_source = source_node_id.strip('"')
-        entity_name_label_target = target_node_id.strip('"')
         """
-        Find all edges between nodes of two given labels
+        Find the edge between two given nodes
 
         Args:
-            source_node_label (str): Label of the source nodes
-            target_node_label (str): Label of the target nodes
+            source_node_id (str): Name of the source node
+            target_node_id (str): Name of the target node
 
         Returns:
-            list: List of all relationships/edges found
+            dict: Properties of the first edge found, or None
         """
+        await self._ensure_schema()
+        source, source_params = self._node_match("start", source_node_id)
+        target, target_params = self._node_match("end", target_node_id)
         async with self._driver.session() as session:
             query = f"""
-            MATCH (start:`{entity_name_label_source}`)-[r]->(end:`{entity_name_label_target}`)
+            MATCH {source}-[r]->{target}
             RETURN properties(r) as edge_properties
             LIMIT 1
-            """.format(
-                entity_name_label_source=entity_name_label_source,
-                entity_name_label_target=entity_name_label_target,
-            )
+            """
 
-            result = await session.run(query)
+            result = await session.run(query, **source_params, **target_params)
             record = await result.single()
             if record:
                 result = dict(record["edge_properties"])
@@ -177,35 +233,145 @@ class Neo4JStorage(BaseGraphStorage):
                 return None
 
     async def get_node_edges(self, source_node_id: str) -> List[Tuple[str, str]]:
-        node_label = source_node_id.strip('"')
-
         """
-        Retrieves all edges (relationships) for a particular node identified by its label.
-        :return: List of dictionaries containing edge information
+        Retrieves all edges (relationships) for a particular node.
+        :return: List of (source, target) entity name pairs
         """
-        query = f"""MATCH (n:`{node_label}`)
+        await self._ensure_schema()
+        node, params = self._node_match("n", source_node_id)
+        query = f"""MATCH {node}
                 OPTIONAL MATCH (n)-[r]-(connected)
-                RETURN n, r, connected"""
+                RETURN {self._node_name("n")} AS source, {self._node_name("connected")} AS target"""
         async with self._driver.session() as session:
-            results = await session.run(query)
+            results = await session.run(query, **params)
             edges = []
             async for record in results:
-                source_node = record["n"]
-                connected_node = record["connected"]
+                if record["source"] and record["target"]:
+                    edges.append((record["source"], record["target"]))
 
-                source_label = (
-                    list(source_node.labels)[0] if source_node.labels else None
-                )
-                target_label = (
-                    list(connected_node.labels)[0]
-                    if connected_node and connected_node.labels
-                    else None
+            return edges
+
+    async def _run_union_all(self, branches: list[str]) -> list:
+        """Run many single-label queries as a few UNION ALL statements.
+
+        Labels cannot be query parameters, so batched lookups in the label
+        model send each item as its own branch; every branch returns its
+        position as ``i``.
+        """
+        records = []
+        async with self._driver.session() as session:
+            for start in range(0, len(branches), self._union_batch_size):
+                query = "\nUNION ALL\n".join(
+                    branches[start : start + self._union_batch_size]
                 )
+                result = await session.run(query)
+                records.extend([record async for record in result])
+        return records
 
-                if source_label and target_label:
-                    edges.append((source_label, target_label))
+    async def _run_unwind(self, query: str, **params) -> list:
+        """Run one parameterized batch query of the property model."""
+        await self._ensure_schema()
+        async with self._driver.session() as session:
+            result = await session.run(query, **params)
+            return [record async for record in result]
+
+    def _ids(self, node_ids: list[str]) -> list[str]:
+        return [node_id.strip('"') for node_id in node_ids]
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        if self._property_model:
+            records = await self._run_unwind(
+                "UNWIND range(0, size($ids) - 1) AS i "
+                f"MATCH (n:`{self._node_label}` {{id: $ids[i]}}) RETURN i, n",
+                ids=self._ids(node_ids),
+            )
+        else:
+            records = await self._run_union_all(
+                [
+                    f"MATCH (n:`{self._label(node_id)}`) RETURN {i} AS i, n"
+                    for i, node_id in enumerate(node_ids)
+                ]
+            )
+        nodes = [None] * len(node_ids)
+        for record in records:
+            if nodes[record["i"]] is None:
+                nodes[record["i"]] = self._node_properties(record["n"])
+        return nodes
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        if self._property_model:
+            records = await self._run_unwind(
+                "UNWIND range(0, size($ids) - 1) AS i "
+                f"MATCH (n:`{self._node_label}` {{id: $ids[i]}}) "
+                "RETURN i, COUNT { (n)--() } AS totalEdgeCount",
+                ids=self._ids(node_ids),
+            )
+        else:
+            records = await self._run_union_all(
+                [
+                    f"MATCH (n:`{self._label(node_id)}`) "
+                    f"RETURN {i} AS i, COUNT {{ (n)--() }} AS totalEdgeCount"
+                    for i, node_id in enumerate(node_ids)
+                ]
+            )
+        degrees = [None] * len(node_ids)
+        for record in records:
+            if degrees[record["i"]] is None:
+                degrees[record["i"]] = record["totalEdgeCount"]
+        return degrees
 
-            return edges
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        if self._property_model:
+            records = await self._run_unwind(
+                "UNWIND range(0, size($sources) - 1) AS i "
+                f"MATCH (start:`{self._node_label}` {{id: $sources[i]}})"
+                f"-[r]->(end:`{self._node_label}` {{id: $targets[i]}}) "
+                "RETURN i, properties(r) AS edge_properties",
+                sources=self._ids([source for source, _ in edge_pairs]),
+                targets=self._ids([target for _, target in edge_pairs]),
+            )
+        else:
+            records = await self._run_union_all(
+                [
+                    f"MATCH (start:`{self._label(source)}`)-[r]->(end:`{self._label(target)}`) "
+                    f"RETURN {i} AS i, properties(r) AS edge_properties LIMIT 1"
+                    for i, (source, target) in enumerate(edge_pairs)
+                ]
+            )
+        edges = [None] * len(edge_pairs)
+        for record in records:
+            if edges[record["i"]] is None:
+                edges[record["i"]] = dict(record["edge_properties"])
+        return edges
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[Union[list[tuple[str, str]], None]]:
+        if self._property_model:
+            records = await self._run_unwind(
+                "UNWIND range(0, size($ids) - 1) AS i "
+                f"MATCH (n:`{self._node_label}` {{id: $ids[i]}}) "
+                "OPTIONAL MATCH (n)-[r]-(connected) "
+                "RETURN i, n.id AS source, connected.id AS target",
+                ids=self._ids(node_ids),
+            )
+        else:
+            records = await self._run_union_all(
+                [
+                    f"MATCH (n:`{self._label(node_id)}`) "
+                    "OPTIONAL MATCH (n)-[r]-(connected) "
+                    f"RETURN {i} AS i, labels(n)[0] AS source, "
+                    "labels(connected)[0] AS target"
+                    for i, node_id in enumerate(node_ids)
+                ]
+            )
+        edges = [[] for _ in node_ids]
+        for record in records:
+            if record["source"] and record["target"]:
+                edges[record["i"]].append((record["source"], record["target"]))
+        return edges
 
     @retry(
         stop=stop_after_attempt(3),
@@ -224,18 +390,20 @@ class Neo4JStorage(BaseGraphStorage):
         Upsert a node in the Neo4j database.
 
         Args:
-            node_id: The unique identifier for the node (used as label)
+            node_id: The unique identifier for the node (label or ``id``)
             node_data: Dictionary of node properties
         """
+        await self._ensure_schema()
         label = node_id.strip('"')
         properties = node_data
+        node, params = self._node_match("n", node_id)
 
         async def _do_upsert(tx: AsyncManagedTransaction):
             query = f"""
-            MERGE (n:`{label}`)
+            MERGE {node}
             SET n += $properties
             """
-            await tx.run(query, properties=properties)
+            await tx.run(query, properties=properties, **params)
             logger.debug(
                 f"Upserted node with label '{label}' and properties: {properties}"
             )
@@ -269,20 +437,25 @@ class Neo4JStorage(BaseGraphStorage):
             target_node_id (str): Label of the target node (used as identifier)
             edge_data (dict): Dictionary of properties to set on the edge
         """
+        await self._ensure_schema()
         source_node_label = source_node_id.strip('"')
         target_node_label = target_node_id.strip('"')
         edge_properties = edge_data
+        source, source_params = self._node_match("source", source_node_id)
+        target, target_params = self._node_match("target", target_node_id)
 
         async def _do_upsert_edge(tx: AsyncManagedTransaction):
             query = f"""
-            MATCH (source:`{source_node_label}`)
+            MATCH {source}
             WITH source
-            MATCH (target:`{target_node_label}`)
+            MATCH {target}
             MERGE (source)-[r:DIRECTED]->(target)
             SET r += $properties
             RETURN r
             """
-            await tx.run(query, properties=edge_properties)
+            await tx.run(
+                query, properties=edge_properties, **source_params, **target_params
+            )
             logger.debug(
                 f"Upserted edge from '{source_node_label}' to '{target_node_label}' with properties: {edge_properties}"
             )
@@ -294,5 +467,107 @@ class Neo4JStorage(BaseGraphStorage):
             logger.error(f"Error during edge upsert: {str(e)}")
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_nodes(self, nodes: list[tuple[str, Dict[str, Any]]]):
+        """
+        Upsert many nodes, ``batch_size`` rows per transaction.
+
+        In the label model labels cannot be parameters, so each batch is one
+        statement with a MERGE subquery per row and the properties passed as
+        ``$rows``; the property model UNWINDs the rows instead.
+        """
+        await self._ensure_schema()
+
+        async def _do_upsert(tx: AsyncManagedTransaction, batch):
+            if self._property_model:
+                await tx.run(
+                    f"UNWIND $rows AS row MERGE (n:`{self._node_label}` {{id: row.id}}) "
+                    "SET n += row.properties",
+                    rows=[
+                        {"id": node_id.strip('"'), "properties": node_data}
+                        for node_id, node_data in batch
+                    ],
+                )
+                return
+            query = "\n".join(
+                f"CALL {{ MERGE (n:`{self._label(node_id)}`) SET n += $rows[{i}] }}"
+                for i, (node_id, _) in enumerate(batch)
+            )
+            await tx.run(query, rows=[node_data for _, node_data in batch])
+
+        try:
+            async with self._driver.session() as session:
+                for start in range(0, len(nodes), self._upsert_batch_size):
+                    batch = nodes[start : start + self._upsert_batch_size]
+                    await session.execute_write(_do_upsert, batch)
+                    logger.debug(f"Upserted {len(batch)} nodes")
+        except Exception as e:
+            logger.error(f"Error during batch upsert: {str(e)}")
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+            )
+        ),
+    )
+    async def upsert_edges(self, edges: list[tuple[str, str, Dict[str, Any]]]):
+        """
+        Upsert many edges, ``batch_size`` rows per transaction. Rows whose
+        nodes do not exist are skipped like in upsert_edge.
+        """
+        await self._ensure_schema()
+
+        async def _do_upsert_edges(tx: AsyncManagedTransaction, batch):
+            if self._property_model:
+                await tx.run(
+                    "UNWIND $rows AS row "
+                    f"MATCH (source:`{self._node_label}` {{id: row.source}}) "
+                    f"MATCH (target:`{self._node_label}` {{id: row.target}}) "
+                    "MERGE (source)-[r:DIRECTED]->(target) SET r += row.properties",
+                    rows=[
+                        {
+                            "source": source_node_id.strip('"'),
+                            "target": target_node_id.strip('"'),
+                            "properties": edge_data,
+                        }
+                        for source_node_id, target_node_id, edge_data in batch
+                    ],
+                )
+                return
+            query = "\n".join(
+                f"CALL {{ MATCH (source:`{self._label(source_node_id)}`) "
+                f"MATCH (target:`{self._label(target_node_id)}`) "
+                f"MERGE (source)-[r:DIRECTED]->(target) SET r += $rows[{i}] }}"
+                for i, (source_node_id, target_node_id, _) in enumerate(batch)
+            )
+            await tx.run(query, rows=[edge_data for *_, edge_data in batch])
+
+        try:
+            async with self._driver.session() as session:
+                for start in range(0, len(edges), self._upsert_batch_size):
+                    batch = edges[start : start + self._upsert_batch_size]
+                    await session.execute_write(_do_upsert_edges, batch)
+                    logger.debug(f"Upserted {len(batch)} edges")
+        except Exception as e:
+            logger.error(f"Error during batch edge upsert: {str(e)}")
+            raise
+
     async def _node2vec_embed(self):
         print("Implemented but never called.")
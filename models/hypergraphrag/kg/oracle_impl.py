@@ -30,6 +30,7 @@ class OracleDB:
         self.workspace = config.get("workspace", None)
         self.max = 12
         self.increment = 1
+        self.batch_size = config.get("batch_size", 1000)
         logger.info(f"Using the label {self.workspace} for Oracle Graph as identifier")
         if self.user is None or self.password is None:
             raise ValueError("Missing database user or password in addon_params")
@@ -163,6 +164,27 @@ class OracleDB:
             print(data)
             raise
 
+    async def executemany(self, sql: str, data: list[dict]):
+        """Run a statement for many rows with array binds, ``batch_size`` rows
+        per round trip and one commit at the end."""
+        if not data:
+            return
+        try:
+            async with self.pool.acquire() as connection:
+                connection.inputtypehandler = self.input_type_handler
+                connection.outputtypehandler = self.output_type_handler
+                with connection.cursor() as cursor:
+                    for start in range(0, len(data), self.batch_size):
+                        await cursor.executemany(
+                            sql, data[start : start + self.batch_size]
+                        )
+                    await connection.commit()
+        except Exception as e:
+            logger.error(f"Oracle database error: {e}")
+            print(sql)
+            print(f"{len(data)} rows")
+            raise
+
 
 @dataclass
 class OracleKVStorage(BaseKVStorage):
@@ -251,9 +273,9 @@ class OracleKVStorage(BaseKVStorage):
             for i, d in enumerate(list_data):
                 d["__vector__"] = embeddings[i]
             # print(list_data)
-            for item in list_data:
-                merge_sql = SQL_TEMPLATES["merge_chunk"]
-                data = {
+            merge_sql = SQL_TEMPLATES["merge_chunk"]
+            rows = [
+                {
                     "check_id": item["__id__"],
                     "id": item["__id__"],
                     "content": item["content"],
@@ -263,21 +285,22 @@ class OracleKVStorage(BaseKVStorage):
                     "full_doc_id": item["full_doc_id"],
                     "content_vector": item["__vector__"],
                 }
-                # print(merge_sql)
-                await self.db.execute(merge_sql, data)
+                for item in list_data
+            ]
+            await self.db.executemany(merge_sql, rows)
 
         if self.namespace == "full_docs":
-            for k, v in self._data.items():
-                # values.clear()
-                merge_sql = SQL_TEMPLATES["merge_doc_full"]
-                data = {
+            merge_sql = SQL_TEMPLATES["merge_doc_full"]
+            rows = [
+                {
                     "check_id": k,
                     "id": k,
                     "content": v["content"],
                     "workspace": self.db.workspace,
                 }
-                # print(merge_sql)
-                await self.db.execute(merge_sql, data)
+                for k, v in data.items()
+            ]
+            await self.db.executemany(merge_sql, rows)
         return left_data
 
     async def index_done_callback(self):
@@ -332,17 +355,7 @@ class OracleGraphStorage(BaseGraphStorage):
 
     #################### insert method ################
 
-    async def upsert_node(self, node_id: str, node_data: dict[str, str]):
-        """插入或更新节点"""
-        # print("go into upsert node method")
-        entity_name = node_id
-        entity_type = node_data["entity_type"]
-        description = node_data["description"]
-        source_id = node_data["source_id"]
-        logger.debug(f"entity_name:{entity_name}, entity_type:{entity_type}")
-
-        content = entity_name + description
-        contents = [content]
+    async def _embed(self, contents: list[str]) -> np.ndarray:
         batches = [
             contents[i : i + self._max_batch_size]
             for i in range(0, len(contents), self._max_batch_size)
@@ -350,63 +363,72 @@ class OracleGraphStorage(BaseGraphStorage):
         embeddings_list = await asyncio.gather(
             *[self.embedding_func(batch) for batch in batches]
         )
-        embeddings = np.concatenate(embeddings_list)
-        content_vector = embeddings[0]
+        return np.concatenate(embeddings_list)
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]):
+        """插入或更新节点"""
+        await self.upsert_nodes([(node_id, node_data)])
+
+    async def upsert_nodes(self, nodes: list[tuple[str, dict[str, str]]]):
+        """批量插入或更新节点"""
+        if not nodes:
+            return
+        rows = []
+        for entity_name, node_data in nodes:
+            description = node_data["description"]
+            logger.debug(
+                f"entity_name:{entity_name}, entity_type:{node_data['entity_type']}"
+            )
+            rows.append(
+                {
+                    "workspace": self.db.workspace,
+                    "name": entity_name,
+                    "entity_type": node_data["entity_type"],
+                    "description": description,
+                    "source_chunk_id": node_data["source_id"],
+                    "content": entity_name + description,
+                }
+            )
+        embeddings = await self._embed([row["content"] for row in rows])
+        for row, content_vector in zip(rows, embeddings):
+            row["content_vector"] = content_vector
         merge_sql = SQL_TEMPLATES["merge_node"]
-        data = {
-            "workspace": self.db.workspace,
-            "name": entity_name,
-            "entity_type": entity_type,
-            "description": description,
-            "source_chunk_id": source_id,
-            "content": content,
-            "content_vector": content_vector,
-        }
-        # print(merge_sql)
-        await self.db.execute(merge_sql, data)
-        # self._graph.add_node(node_id, **node_data)
+        await self.db.executemany(merge_sql, rows)
 
     async def upsert_edge(
         self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
     ):
         """插入或更新边"""
-        # print("go into upsert edge method")
-        source_name = source_node_id
-        target_name = target_node_id
-        weight = edge_data["weight"]
-        keywords = edge_data["keywords"]
-        description = edge_data["description"]
-        source_chunk_id = edge_data["source_id"]
-        logger.debug(
-            f"source_name:{source_name}, target_name:{target_name}, keywords: {keywords}"
-        )
-
-        content = keywords + source_name + target_name + description
-        contents = [content]
-        batches = [
-            contents[i : i + self._max_batch_size]
-            for i in range(0, len(contents), self._max_batch_size)
-        ]
-        embeddings_list = await asyncio.gather(
-            *[self.embedding_func(batch) for batch in batches]
-        )
-        embeddings = np.concatenate(embeddings_list)
-        content_vector = embeddings[0]
+        await self.upsert_edges([(source_node_id, target_node_id, edge_data)])
+
+    async def upsert_edges(self, edges: list[tuple[str, str, dict[str, str]]]):
+        """批量插入或更新边"""
+        if not edges:
+            return
+        rows = []
+        for source_name, target_name, edge_data in edges:
+            keywords = edge_data["keywords"]
+            description = edge_data["description"]
+            logger.debug(
+                f"source_name:{source_name}, target_name:{target_name}, keywords: {keywords}"
+            )
+            rows.append(
+                {
+                    "workspace": self.db.workspace,
+                    "source_name": source_name,
+                    "target_name": target_name,
+                    "weight": edge_data["weight"],
+                    "keywords": keywords,
+                    "description": description,
+                    "source_chunk_id": edge_data["source_id"],
+                    "content": keywords + source_name + target_name + description,
+                }
+            )
+        embeddings = await self._embed([row["content"] for row in rows])
+        for row, content_vector in zip(rows, embeddings):
+            row["content_vector"] = content_vector
         merge_sql = SQL_TEMPLATES["merge_edge"]
-        data = {
-            "workspace": self.db.workspace,
-            "source_name": source_name,
-            "target_name": target_name,
-            "weight": weight,
-            "keywords": keywords,
-            "description": description,
-            "source_chunk_id": source_chunk_id,
-            "content": content,
-            "content_vector": content_vector,
-        }
-        # print(merge_sql)
-        await self.db.execute(merge_sql, data)
-        # self._graph.add_edge(source_node_id, target_node_id, **edge_data)
+        await self.db.executemany(merge_sql, rows)
 
     async def embed_nodes(self, algorithm: str) -> tuple[np.ndarray, list[str]]:
         """为节点生成向量"""
@@ -529,6 +551,66 @@ class OracleGraphStorage(BaseGraphStorage):
                 # print("Node Edge not exist!",self.db.workspace, source_node_id)
                 return []
 
+    async def _query_in(self, sql_name: str, names: list[str], batch_size=500):
+        """Run a template with an ``{ids}`` IN list over bind variables, in
+        batches below Oracle's 1000 item IN limit"""
+        rows = []
+        names = list(dict.fromkeys(names))
+        for start in range(0, len(names), batch_size):
+            batch = names[start : start + batch_size]
+            params = {f"id{i}": name for i, name in enumerate(batch)}
+            SQL = SQL_TEMPLATES[sql_name].format(
+                ids=",".join(f":{key}" for key in params)
+            )
+            params["workspace"] = self.db.workspace
+            rows.extend(await self.db.query(SQL, params, multirows=True))
+        return rows
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        """根据节点id批量获取节点数据"""
+        nodes = {}
+        for row in await self._query_in("get_nodes", node_ids):
+            nodes.setdefault(row["name"], row)
+        return [nodes.get(node_id) for node_id in node_ids]
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        """根据节点id批量获取节点的度"""
+        degrees = {}
+        for row in await self._query_in("node_degrees", node_ids):
+            degrees[row["name"]] = degrees.get(row["name"], 0) + row["degree"]
+        return [degrees.get(node_id, 0) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        """根据源和目标节点id批量获取边"""
+        # Select every edge leaving the sources, then keep the requested pairs
+        edges = {}
+        for row in await self._query_in("get_edges", [s for s, _ in edge_pairs]):
+            edges.setdefault((row["source_name"], row["target_name"]), row)
+        results = []
+        for pair in edge_pairs:
+            row = edges.get(tuple(pair))
+            if row is not None:
+                row = {
+                    "weight": row["weight"],
+                    "source_id": row["source_chunk_id"],
+                    "keywords": row["keywords"],
+                    "description": row["description"],
+                }
+            results.append(row)
+        return results
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[Union[list[tuple[str, str]], None]]:
+        """根据节点id批量获取节点的所有边"""
+        existing = {row["name"] for row in await self._query_in("has_nodes", node_ids)}
+        edges = {node_id: [] for node_id in existing}
+        for row in await self._query_in("get_nodes_edges", list(existing)):
+            edges[row["source_name"]].append((row["source_name"], row["target_name"]))
+        return [edges.get(node_id) for node_id in node_ids]
+
     async def get_all_nodes(self, limit: int):
         """查询所有节点"""
         SQL = SQL_TEMPLATES["get_all_nodes"]
@@ -712,6 +794,42 @@ SQL_TEMPLATES = {
             WHERE e.workspace=:workspace and a.workspace=:workspace and b.workspace=:workspace
             AND a.name=:source_node_id
             COLUMNS (a.name as source_name,b.name as target_name))""",
+    "has_nodes": """SELECT * FROM GRAPH_TABLE (hypergraphrag_graph
+        MATCH (a)
+        WHERE a.workspace=:workspace AND a.name in ({ids})
+        COLUMNS (a.name))""",
+    "node_degrees": """SELECT name, count(1) as degree FROM GRAPH_TABLE (hypergraphrag_graph
+        MATCH (a)-[e]->(b)
+        WHERE e.workspace=:workspace and a.workspace=:workspace and b.workspace=:workspace
+        AND a.name in ({ids})
+        COLUMNS (a.name as name)) GROUP BY name
+        UNION ALL
+        SELECT name, count(1) as degree FROM GRAPH_TABLE (hypergraphrag_graph
+        MATCH (a)-[e]->(b)
+        WHERE e.workspace=:workspace and a.workspace=:workspace and b.workspace=:workspace
+        AND b.name in ({ids})
+        COLUMNS (b.name as name)) GROUP BY name""",
+    "get_nodes": """SELECT t1.name,t2.entity_type,t2.source_chunk_id as source_id,NVL(t2.description,'') AS description
+        FROM GRAPH_TABLE (hypergraphrag_graph
+        MATCH (a)
+        WHERE a.workspace=:workspace AND a.name in ({ids})
+        COLUMNS (a.name)
+        ) t1 JOIN HYPERGRAPHRAG_GRAPH_NODES t2 on t1.name=t2.name
+        WHERE t2.workspace=:workspace""",
+    "get_edges": """SELECT t1.source_name,t1.target_name,t2.weight,t2.source_chunk_id,
+        NVL(t2.description,'') AS description,NVL(t2.KEYWORDS,'') AS keywords
+        FROM GRAPH_TABLE (hypergraphrag_graph
+        MATCH (a)-[e]->(b)
+        WHERE e.workspace=:workspace and a.workspace=:workspace and b.workspace=:workspace
+        AND a.name in ({ids})
+        COLUMNS (e.id,a.name as source_name,b.name as target_name)
+        ) t1 JOIN HYPERGRAPHRAG_GRAPH_EDGES t2 on t1.id=t2.id""",
+    "get_nodes_edges": """SELECT source_name,target_name
+            FROM GRAPH_TABLE (hypergraphrag_graph
+            MATCH (a)-[e]->(b)
+            WHERE e.workspace=:workspace and a.workspace=:workspace and b.workspace=:workspace
+            AND a.name in ({ids})
+            COLUMNS (a.name as source_name,b.name as target_name))""",
     "merge_node": """MERGE INTO HYPERGRAPHRAG_GRAPH_NODES a
                     USING DUAL
                     ON (a.workspace = :workspace and a.name=:name and a.source_chunk_id=:source_chunk_id)
@@ -1,6 +1,9 @@
 import asyncio
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from typing import Union
 
 import numpy as np
@@ -10,6 +13,20 @@ from tqdm import tqdm
 from hypergraphrag.base import BaseVectorStorage, BaseKVStorage
 from hypergraphrag.utils import logger
 
+_VALUES_RE = re.compile(r"VALUES\s*(\([^)]*\))", re.IGNORECASE)
+_PARAM_RE = re.compile(r":(\w+)")
+
+
+def _multirow_sql(sql: str, n_rows: int) -> str:
+    """Repeat the VALUES tuple of a single-row INSERT for ``n_rows`` rows.
+
+    The parameters of row ``i`` get an ``_i`` suffix.
+    """
+    match = _VALUES_RE.search(sql)
+    row = match.group(1)
+    rows = ", ".join(_PARAM_RE.sub(rf":\1_{i}", row) for i in range(n_rows))
+    return sql[: match.start(1)] + rows + sql[match.end(1) :]
+
 
 class TiDB(object):
     def __init__(self, config, **kwargs):
@@ -19,13 +36,26 @@ class TiDB(object):
         self.password = config.get("password", None)
         self.database = config.get("database", None)
         self.workspace = config.get("workspace", None)
+        self.pool_size = config.get("pool_size", 5)
+        self.max_overflow = config.get("max_overflow", 10)
+        self.batch_size = config.get("batch_size", 100)
         connection_string = (
             f"mysql+pymysql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
             f"?ssl_verify_cert=true&ssl_verify_identity=true"
         )
 
         try:
-            self.engine = create_engine(connection_string)
+            self.engine = create_engine(
+                connection_string,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_pre_ping=True,
+            )
+            # blocking driver calls run here, one thread per pooled connection
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool_size + self.max_overflow,
+                thread_name_prefix="tidb",
+            )
             logger.info(f"Connected to TiDB database at {self.database}")
         except Exception as e:
             logger.error(f"Failed to connect to TiDB database at {self.database}")
@@ -47,6 +77,10 @@ class TiDB(object):
                     logger.error(f"Failed to create table {k} in TiDB database")
                     logger.error(f"TiDB database error: {e}")
 
+    async def _run(self, func: callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
     async def query(
         self, sql: str, params: dict = None, multirows: bool = False
     ) -> Union[dict, None]:
@@ -54,6 +88,9 @@ class TiDB(object):
             params = {"workspace": self.workspace}
         else:
             params.update({"workspace": self.workspace})
+        return await self._run(self._query, sql, params, multirows)
+
+    def _query(self, sql: str, params: dict, multirows: bool) -> Union[dict, None]:
         with self.engine.connect() as conn, conn.begin():
             try:
                 result = conn.execute(text(sql), params)
@@ -77,6 +114,9 @@ class TiDB(object):
             return data
 
     async def execute(self, sql: str, data: list | dict = None):
+        await self._run(self._execute, sql, data)
+
+    def _execute(self, sql: str, data: list | dict = None):
         # logger.info("go into TiDBDB execute method")
         try:
             with self.engine.connect() as conn, conn.begin():
@@ -90,6 +130,30 @@ class TiDB(object):
             print(data)
             raise
 
+    async def execute_values(self, sql: str, data: list[dict]):
+        """Run a single-row INSERT template as multi-row statements of
+        ``batch_size`` rows each, all in one transaction."""
+        if not data:
+            return
+        statements = []
+        for start in range(0, len(data), self.batch_size):
+            batch = data[start : start + self.batch_size]
+            params = {
+                f"{k}_{i}": v for i, row in enumerate(batch) for k, v in row.items()
+            }
+            statements.append((text(_multirow_sql(sql, len(batch))), params))
+        await self._run(self._execute_statements, sql, statements)
+
+    def _execute_statements(self, sql: str, statements: list):
+        try:
+            with self.engine.connect() as conn, conn.begin():
+                for statement, params in statements:
+                    conn.execute(statement, params)
+        except Exception as e:
+            logger.error(f"TiDB database error: {e}")
+            print(sql)
+            raise
+
 
 @dataclass
 class TiDBKVStorage(BaseKVStorage):
@@ -183,16 +247,16 @@ class TiDBKVStorage(BaseKVStorage):
                         "tokens": item["tokens"],
                         "chunk_order_index": item["chunk_order_index"],
                         "full_doc_id": item["full_doc_id"],
-                        "content_vector": f"{item["__vector__"].tolist()}",
+                        "content_vector": f"{item['__vector__'].tolist()}",
                         "workspace": self.db.workspace,
                     }
                 )
-            await self.db.execute(merge_sql, data)
+            await self.db.execute_values(merge_sql, data)
 
         if self.namespace == "full_docs":
             merge_sql = SQL_TEMPLATES["upsert_doc_full"]
             data = []
-            for k, v in self._data.items():
+            for k, v in left_data.items():
                 data.append(
                     {
                         "id": k,
@@ -200,7 +264,7 @@ class TiDBKVStorage(BaseKVStorage):
                         "workspace": self.db.workspace,
                     }
                 )
-            await self.db.execute(merge_sql, data)
+            await self.db.execute_values(merge_sql, data)
         return left_data
 
     async def index_done_callback(self):
@@ -288,11 +352,11 @@ class TiDBVectorDBStorage(BaseVectorStorage):
                         "id": item["id"],
                         "name": item["entity_name"],
                         "content": item["content"],
-                        "content_vector": f"{item["content_vector"].tolist()}",
+                        "content_vector": f"{item['content_vector'].tolist()}",
                         "workspace": self.db.workspace,
                     }
                 )
-            await self.db.execute(merge_sql, data)
+            await self.db.execute_values(merge_sql, data)
 
         elif self.namespace == "relationships":
             data = []
@@ -304,11 +368,11 @@ class TiDBVectorDBStorage(BaseVectorStorage):
                         "source_name": item["src_id"],
                         "target_name": item["tgt_id"],
                         "content": item["content"],
-                        "content_vector": f"{item["content_vector"].tolist()}",
+                        "content_vector": f"{item['content_vector'].tolist()}",
                         "workspace": self.db.workspace,
                     }
                 )
-            await self.db.execute(merge_sql, data)
+            await self.db.execute_values(merge_sql, data)
 
 
 N_T = {
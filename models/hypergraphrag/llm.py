@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import copy
 import json
@@ -8,6 +9,7 @@ from functools import lru_cache
 from typing import List, Dict, Callable, Any, Union, Optional
 import aioboto3
 import aiohttp
+import httpx
 import numpy as np
 import ollama
 import torch
@@ -17,6 +19,7 @@ from openai import (
     RateLimitError,
     Timeout,
     AsyncAzureOpenAI,
+    DefaultAsyncHttpxClient,
 )
 from pydantic import BaseModel, Field
 from tenacity import (
@@ -28,6 +31,9 @@ from tenacity import (
 from transformers import AutoTokenizer, AutoModelForCausalLM
 
 from .utils import (
+    cache_llm_response,
+    pace_rate_limited_attempt,
+    report_rate_limit_headers,
     wrap_embedding_func_with_attrs,
     locate_json_string_body_from_string,
     safe_unicode_decode,
@@ -43,7 +49,66 @@ else:
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+# keep-alive pool limits of the shared API clients
+API_CLIENT_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=30
+)
+_api_clients: dict[tuple, Any] = {}
+
+
+def set_api_client_limits(limits: httpx.Limits):
+    """Set the pool limits of API clients created from now on"""
+    global API_CLIENT_LIMITS
+    API_CLIENT_LIMITS = limits
+    _api_clients.clear()
+
+
+def get_api_client(provider: str, base_url=None, api_key=None, **client_kwargs):
+    """Return the process-wide client of an API endpoint, creating it once.
 
+    Clients are keyed by provider, endpoint, credentials and the running event
+    loop, as an async connection pool cannot move between loops. Clients of
+    loops that have been closed, e.g. by the ``asyncio.run`` of a sync call,
+    are evicted on the next miss. Providers are "openai", "azure_openai" and
+    "ollama".
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    # repr, since options like httpx.Timeout are not hashable
+    key = (provider, base_url, api_key, loop, repr(sorted(client_kwargs.items())))
+    client = _api_clients.get(key)
+    if client is not None:
+        return client
+    for stale_key in [k for k in _api_clients if k[3] is not None and k[3].is_closed()]:
+        del _api_clients[stale_key]
+
+    if provider == "openai":
+        client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(limits=API_CLIENT_LIMITS),
+            **client_kwargs,
+        )
+    elif provider == "azure_openai":
+        client = AsyncAzureOpenAI(
+            azure_endpoint=base_url,
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(limits=API_CLIENT_LIMITS),
+            **client_kwargs,
+        )
+    elif provider == "ollama":
+        client = ollama.AsyncClient(
+            host=base_url, limits=API_CLIENT_LIMITS, **client_kwargs
+        )
+    else:
+        raise ValueError(f"Unknown API client provider {provider}")
+    _api_clients[key] = client
+    return client
+
+
+@cache_llm_response
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -58,11 +123,12 @@ async def openai_complete_if_cache(
     api_key=None,
     **kwargs,
 ) -> str:
+    await pace_rate_limited_attempt()
     if api_key:
         os.environ["OPENAI_API_KEY"] = api_key
 
-    openai_async_client = (
-        AsyncOpenAI() if base_url is None else AsyncOpenAI(base_url=base_url)
+    openai_async_client = get_api_client(
+        "openai", base_url=base_url, api_key=os.environ.get("OPENAI_API_KEY")
     )
     kwargs.pop("hashing_kv", None)
     kwargs.pop("keyword_extraction", None)
@@ -78,13 +144,19 @@ async def openai_complete_if_cache(
     logger.debug(f"System prompt: {system_prompt}")
     logger.debug("Full context:")
     if "response_format" in kwargs:
-        response = await openai_async_client.beta.chat.completions.parse(
-            model=model, messages=messages, **kwargs
+        raw_response = (
+            await openai_async_client.beta.chat.completions.with_raw_response.parse(
+                model=model, messages=messages, **kwargs
+            )
         )
     else:
-        response = await openai_async_client.chat.completions.create(
-            model=model, messages=messages, **kwargs
+        raw_response = (
+            await openai_async_client.chat.completions.with_raw_response.create(
+                model=model, messages=messages, **kwargs
+            )
         )
+    report_rate_limit_headers(raw_response.headers)
+    response = raw_response.parse()
 
     if hasattr(response, "__aiter__"):
 
@@ -105,6 +177,7 @@ async def openai_complete_if_cache(
         return content
 
 
+@cache_llm_response
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -120,6 +193,7 @@ async def azure_openai_complete_if_cache(
     api_version=None,
     **kwargs,
 ):
+    await pace_rate_limited_attempt()
     if api_key:
         os.environ["AZURE_OPENAI_API_KEY"] = api_key
     if base_url:
@@ -127,8 +201,9 @@ async def azure_openai_complete_if_cache(
     if api_version:
         os.environ["AZURE_OPENAI_API_VERSION"] = api_version
 
-    openai_async_client = AsyncAzureOpenAI(
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    openai_async_client = get_api_client(
+        "azure_openai",
+        base_url=os.getenv("AZURE_OPENAI_ENDPOINT"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
     )
@@ -140,10 +215,11 @@ async def azure_openai_complete_if_cache(
     if prompt is not None:
         messages.append({"role": "user", "content": prompt})
 
-    response = await openai_async_client.chat.completions.create(
+    raw_response = await openai_async_client.chat.completions.with_raw_response.create(
         model=model, messages=messages, **kwargs
     )
-    content = response.choices[0].message.content
+    report_rate_limit_headers(raw_response.headers)
+    content = raw_response.parse().choices[0].message.content
 
     return content
 
@@ -152,6 +228,7 @@ class BedrockError(Exception):
     """Generic error for issues related to Amazon Bedrock"""
 
 
+@cache_llm_response
 @retry(
     stop=stop_after_attempt(5),
     wait=wait_exponential(multiplier=1, max=60),
@@ -167,6 +244,7 @@ async def bedrock_complete_if_cache(
     aws_session_token=None,
     **kwargs,
 ) -> str:
+    await pace_rate_limited_attempt()
     os.environ["AWS_ACCESS_KEY_ID"] = os.environ.get(
         "AWS_ACCESS_KEY_ID", aws_access_key_id
     )
@@ -234,6 +312,7 @@ def initialize_hf_model(model_name):
     return hf_model, hf_tokenizer
 
 
+@cache_llm_response
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -301,6 +380,7 @@ async def hf_model_if_cache(
     return response_text
 
 
+@cache_llm_response
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -313,13 +393,14 @@ async def ollama_model_if_cache(
     history_messages=[],
     **kwargs,
 ) -> Union[str, AsyncIterator[str]]:
+    await pace_rate_limited_attempt()
     stream = True if kwargs.get("stream") else False
     kwargs.pop("max_tokens", None)
     # kwargs.pop("response_format", None) # allow json
     host = kwargs.pop("host", None)
     timeout = kwargs.pop("timeout", None)
     kwargs.pop("hashing_kv", None)
-    ollama_client = ollama.AsyncClient(host=host, timeout=timeout)
+    ollama_client = get_api_client("ollama", base_url=host, timeout=timeout)
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
@@ -328,7 +409,6 @@ async def ollama_model_if_cache(
 
     response = await ollama_client.chat(model=model, messages=messages, **kwargs)
     if stream:
-        """cannot cache stream response"""
 
         async def inner():
             async for chunk in response:
@@ -363,6 +443,7 @@ def initialize_lmdeploy_pipeline(
     return lmdeploy_pipe
 
 
+@cache_llm_response
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -597,6 +678,7 @@ async def ollama_model_complete(
     )
 
 
+@cache_llm_response
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -610,6 +692,7 @@ async def zhipu_complete_if_cache(
     history_messages: List[Dict[str, str]] = [],
     **kwargs,
 ) -> str:
+    await pace_rate_limited_attempt()
     # dynamically load ZhipuAI
     try:
         from zhipuai import ZhipuAI
@@ -735,6 +818,7 @@ async def zhipu_complete(
 async def zhipu_embedding(
     texts: list[str], model: str = "embedding-3", api_key: str = None, **kwargs
 ) -> np.ndarray:
+    await pace_rate_limited_attempt()
     # dynamically load ZhipuAI
     try:
         from zhipuai import ZhipuAI
@@ -774,15 +858,18 @@ async def openai_embedding(
     base_url: str = None,
     api_key: str = None,
 ) -> np.ndarray:
+    await pace_rate_limited_attempt()
     if api_key:
         os.environ["OPENAI_API_KEY"] = api_key
 
-    openai_async_client = (
-        AsyncOpenAI() if base_url is None else AsyncOpenAI(base_url=base_url)
+    openai_async_client = get_api_client(
+        "openai", base_url=base_url, api_key=os.environ.get("OPENAI_API_KEY")
     )
-    response = await openai_async_client.embeddings.create(
+    raw_response = await openai_async_client.embeddings.with_raw_response.create(
         model=model, input=texts, encoding_format="float"
     )
+    report_rate_limit_headers(raw_response.headers)
+    response = raw_response.parse()
     return np.array([dp.embedding for dp in response.data])
 
 
@@ -836,11 +923,12 @@ async def nvidia_openai_embedding(
     trunc: str = "NONE",  # NONE or START or END
     encode: str = "float",  # float or base64
 ) -> np.ndarray:
+    await pace_rate_limited_attempt()
     if api_key:
         os.environ["OPENAI_API_KEY"] = api_key
 
-    openai_async_client = (
-        AsyncOpenAI() if base_url is None else AsyncOpenAI(base_url=base_url)
+    openai_async_client = get_api_client(
+        "openai", base_url=base_url, api_key=os.environ.get("OPENAI_API_KEY")
     )
     response = await openai_async_client.embeddings.create(
         model=model,
@@ -864,6 +952,7 @@ async def azure_openai_embedding(
     api_key: str = None,
     api_version: str = None,
 ) -> np.ndarray:
+    await pace_rate_limited_attempt()
     if api_key:
         os.environ["AZURE_OPENAI_API_KEY"] = api_key
     if base_url:
@@ -871,15 +960,18 @@ async def azure_openai_embedding(
     if api_version:
         os.environ["AZURE_OPENAI_API_VERSION"] = api_version
 
-    openai_async_client = AsyncAzureOpenAI(
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    openai_async_client = get_api_client(
+        "azure_openai",
+        base_url=os.getenv("AZURE_OPENAI_ENDPOINT"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
     )
 
-    response = await openai_async_client.embeddings.create(
+    raw_response = await openai_async_client.embeddings.with_raw_response.create(
         model=model, input=texts, encoding_format="float"
     )
+    report_rate_limit_headers(raw_response.headers)
+    response = raw_response.parse()
     return np.array([dp.embedding for dp in response.data])
 
 
@@ -895,6 +987,7 @@ async def siliconcloud_embedding(
     max_token_size: int = 512,
     api_key: str = None,
 ) -> np.ndarray:
+    await pace_rate_limited_attempt()
     if api_key and not api_key.startswith("Bearer "):
         api_key = "Bearer " + api_key
 
@@ -1012,17 +1105,19 @@ async def ollama_embedding(texts: list[str], embed_model, **kwargs) -> np.ndarra
     Deprecated in favor of `embed`.
     """
     embed_text = []
-    ollama_client = ollama.Client(**kwargs)
+    host = kwargs.pop("host", None)
+    ollama_client = get_api_client("ollama", base_url=host, **kwargs)
     for text in texts:
-        data = ollama_client.embeddings(model=embed_model, prompt=text)
+        data = await ollama_client.embeddings(model=embed_model, prompt=text)
         embed_text.append(data["embedding"])
 
     return embed_text
 
 
 async def ollama_embed(texts: list[str], embed_model, **kwargs) -> np.ndarray:
-    ollama_client = ollama.Client(**kwargs)
-    data = ollama_client.embed(model=embed_model, input=texts)
+    host = kwargs.pop("host", None)
+    ollama_client = get_api_client("ollama", base_url=host, **kwargs)
+    data = await ollama_client.embed(model=embed_model, input=texts)
     return data["embeddings"]
 
 
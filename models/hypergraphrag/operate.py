@@ -2,18 +2,22 @@ import asyncio
 import json
 import re
 from tqdm.asyncio import tqdm as tqdm_async
-from typing import Union
+from typing import AsyncIterator, Union
 from collections import Counter, defaultdict
 import warnings
 from .utils import (
     logger,
     clean_str,
     compute_mdhash_id,
+    count_tokens_by_tiktoken,
     decode_tokens_by_tiktoken,
+    decode_tokens_batch_by_tiktoken,
     encode_string_by_tiktoken,
+    encode_strings_by_tiktoken,
     is_float_regex,
     list_of_list_to_csv,
     pack_user_ass_to_openai_messages,
+    RecordStreamParser,
     split_string_by_multi_markers,
     truncate_list_by_token_size,
     process_combine_contexts,
@@ -31,21 +35,45 @@ from .base import (
 )
 from .prompt import GRAPH_FIELD_SEP, PROMPTS
 
+_RECORD_BODY = re.compile(r"\((.*)\)")
+
 
 def chunking_by_token_size(
     content: str, overlap_token_size=128, max_token_size=1024, tiktoken_model="gpt-4o"
 ):
-    tokens = encode_string_by_tiktoken(content, model_name=tiktoken_model)
-    results = []
-    for index, start in enumerate(
-        range(0, len(tokens), max_token_size - overlap_token_size)
-    ):
-        chunk_content = decode_tokens_by_tiktoken(
-            tokens[start : start + max_token_size], model_name=tiktoken_model
-        )
-        results.append(
+    return chunking_by_token_size_batch(
+        [content], overlap_token_size, max_token_size, tiktoken_model
+    )[0]
+
+
+def chunking_by_token_size_batch(
+    contents: list[str],
+    overlap_token_size=128,
+    max_token_size=1024,
+    tiktoken_model="gpt-4o",
+) -> list[list[dict]]:
+    """Chunk many documents with one batch encode and one batch decode"""
+    tokens_list = encode_strings_by_tiktoken(contents, model_name=tiktoken_model)
+    windows = []
+    for doc_index, tokens in enumerate(tokens_list):
+        for index, start in enumerate(
+            range(0, len(tokens), max_token_size - overlap_token_size)
+        ):
+            windows.append(
+                (doc_index, index, min(max_token_size, len(tokens) - start), start)
+            )
+    chunk_contents = decode_tokens_batch_by_tiktoken(
+        [
+            tokens_list[doc_index][start : start + max_token_size]
+            for doc_index, _, _, start in windows
+        ],
+        model_name=tiktoken_model,
+    )
+    results = [[] for _ in contents]
+    for (doc_index, index, n_tokens, _), chunk_content in zip(windows, chunk_contents):
+        results[doc_index].append(
             {
-                "tokens": min(max_token_size, len(tokens) - start),
+                "tokens": n_tokens,
                 "content": chunk_content.strip(),
                 "chunk_order_index": index,
             }
@@ -132,143 +160,243 @@ async def _handle_single_hyperrelation_extraction(
     
 
 async def _merge_hyperedges_then_upsert(
-    hyperedge_name: str,
-    nodes_data: list[dict],
+    maybe_edges: dict[str, list[dict]],
     knowledge_graph_inst: BaseGraphStorage,
     global_config: dict,
 ):
-    already_weights = []
-    already_source_ids = []
-
-    already_hyperedge = await knowledge_graph_inst.get_node(hyperedge_name)
-    if already_hyperedge is not None:
-        already_weights.append(already_hyperedge["weight"])
-        already_source_ids.extend(
-            split_string_by_multi_markers(already_hyperedge["source_id"], [GRAPH_FIELD_SEP])
+    hyperedge_names = list(maybe_edges)
+    already_hyperedges = await knowledge_graph_inst.get_nodes(hyperedge_names)
+
+    all_hyperedges_data = []
+    for hyperedge_name, already_hyperedge in zip(hyperedge_names, already_hyperedges):
+        nodes_data = maybe_edges[hyperedge_name]
+        already_weights = []
+        already_source_ids = []
+
+        if already_hyperedge is not None:
+            already_weights.append(already_hyperedge["weight"])
+            already_source_ids.extend(
+                split_string_by_multi_markers(
+                    already_hyperedge["source_id"], [GRAPH_FIELD_SEP]
+                )
+            )
+
+        weight = sum([dp["weight"] for dp in nodes_data] + already_weights)
+        source_id = GRAPH_FIELD_SEP.join(
+            set([dp["source_id"] for dp in nodes_data] + already_source_ids)
+        )
+        all_hyperedges_data.append(
+            dict(
+                role="hyperedge",
+                weight=weight,
+                source_id=source_id,
+                hyperedge_tokens=count_tokens_by_tiktoken(hyperedge_name),
+            )
         )
 
-    weight = sum([dp["weight"] for dp in nodes_data] + already_weights)
-    source_id = GRAPH_FIELD_SEP.join(
-        set([dp["source_id"] for dp in nodes_data] + already_source_ids)
-    )
-    node_data = dict(
-        role = "hyperedge",
-        weight=weight,
-        source_id=source_id,
+    await knowledge_graph_inst.upsert_nodes(
+        list(zip(hyperedge_names, all_hyperedges_data))
     )
-    await knowledge_graph_inst.upsert_node(
-        hyperedge_name,
-        node_data=node_data,
-    )
-    node_data["hyperedge_name"] = hyperedge_name
-    return node_data
+    return [
+        {**node_data, "hyperedge_name": hyperedge_name}
+        for hyperedge_name, node_data in zip(hyperedge_names, all_hyperedges_data)
+    ]
 
 
 async def _merge_nodes_then_upsert(
-    entity_name: str,
-    nodes_data: list[dict],
+    maybe_nodes: dict[str, list[dict]],
     knowledge_graph_inst: BaseGraphStorage,
     global_config: dict,
 ):
-    already_entity_types = []
-    already_source_ids = []
-    already_description = []
-
-    already_node = await knowledge_graph_inst.get_node(entity_name)
-    if already_node is not None:
-        already_entity_types.append(already_node["entity_type"])
-        already_source_ids.extend(
-            split_string_by_multi_markers(already_node["source_id"], [GRAPH_FIELD_SEP])
+    entity_names = list(maybe_nodes)
+    already_nodes = await knowledge_graph_inst.get_nodes(entity_names)
+
+    async def _merge_single_node(entity_name: str, already_node: Union[dict, None]):
+        nodes_data = maybe_nodes[entity_name]
+        already_entity_types = []
+        already_source_ids = []
+        already_description = []
+
+        if already_node is not None:
+            already_entity_types.append(already_node["entity_type"])
+            already_source_ids.extend(
+                split_string_by_multi_markers(
+                    already_node["source_id"], [GRAPH_FIELD_SEP]
+                )
+            )
+            already_description.append(already_node["description"])
+
+        entity_type = sorted(
+            Counter(
+                [dp["entity_type"] for dp in nodes_data] + already_entity_types
+            ).items(),
+            key=lambda x: x[1],
+            reverse=True,
+        )[0][0]
+        description = GRAPH_FIELD_SEP.join(
+            sorted(set([dp["description"] for dp in nodes_data] + already_description))
         )
-        already_description.append(already_node["description"])
-
-    entity_type = sorted(
-        Counter(
-            [dp["entity_type"] for dp in nodes_data] + already_entity_types
-        ).items(),
-        key=lambda x: x[1],
-        reverse=True,
-    )[0][0]
-    description = GRAPH_FIELD_SEP.join(
-        sorted(set([dp["description"] for dp in nodes_data] + already_description))
-    )
-    source_id = GRAPH_FIELD_SEP.join(
-        set([dp["source_id"] for dp in nodes_data] + already_source_ids)
-    )
-    description = await _handle_entity_relation_summary(
-        entity_name, description, global_config
-    )
-    node_data = dict(
-        role="entity",
-        entity_type=entity_type,
-        description=description,
-        source_id=source_id,
-    )
-    await knowledge_graph_inst.upsert_node(
-        entity_name,
-        node_data=node_data,
+        source_id = GRAPH_FIELD_SEP.join(
+            set([dp["source_id"] for dp in nodes_data] + already_source_ids)
+        )
+        description = await _handle_entity_relation_summary(
+            entity_name, description, global_config
+        )
+        return dict(
+            role="entity",
+            entity_type=entity_type,
+            description=description,
+            source_id=source_id,
+            description_tokens=count_tokens_by_tiktoken(description),
+        )
+
+    # Summaries may call the LLM, run them concurrently before one batch upsert
+    all_nodes_data = await tqdm_async.gather(
+        *[
+            _merge_single_node(entity_name, already_node)
+            for entity_name, already_node in zip(entity_names, already_nodes)
+        ],
+        total=len(entity_names),
+        desc="Inserting entities",
+        unit="entity",
     )
-    node_data["entity_name"] = entity_name
-    return node_data
+
+    await knowledge_graph_inst.upsert_nodes(list(zip(entity_names, all_nodes_data)))
+    return [
+        {**node_data, "entity_name": entity_name}
+        for entity_name, node_data in zip(entity_names, all_nodes_data)
+    ]
 
 
 async def _merge_edges_then_upsert(
-    entity_name: str,
-    nodes_data: list[dict],
+    maybe_nodes: dict[str, list[dict]],
     knowledge_graph_inst: BaseGraphStorage,
     global_config: dict,
 ):
+    # One edge from each hyperedge to each of its entities
+    edges_nodes_data = defaultdict(list)
+    for entity_name, nodes_data in maybe_nodes.items():
+        for node in nodes_data:
+            edges_nodes_data[(node["hyper_relation"], entity_name)].append(node)
+    edge_pairs = list(edges_nodes_data)
+    already_edges = await knowledge_graph_inst.get_edges(edge_pairs)
+
     edge_data = []
-    
-    for node in nodes_data:
-        source_id = node["source_id"]
-        hyper_relation = node["hyper_relation"]
-        weight = node["weight"]
-        
+    for (hyper_relation, entity_name), already_edge in zip(edge_pairs, already_edges):
+        nodes_data = edges_nodes_data[(hyper_relation, entity_name)]
         already_weights = []
         already_source_ids = []
-        
-        if await knowledge_graph_inst.has_edge(hyper_relation, entity_name):
-            already_edge = await knowledge_graph_inst.get_edge(hyper_relation, entity_name)
+
+        if already_edge is not None:
             already_weights.append(already_edge["weight"])
             already_source_ids.extend(
-                split_string_by_multi_markers(already_edge["source_id"], [GRAPH_FIELD_SEP])
+                split_string_by_multi_markers(
+                    already_edge["source_id"], [GRAPH_FIELD_SEP]
+                )
             )
-        
-        weight = sum([weight] + already_weights)
+
+        weight = sum([dp["weight"] for dp in nodes_data] + already_weights)
         source_id = GRAPH_FIELD_SEP.join(
-            set([source_id] + already_source_ids)
+            set([dp["source_id"] for dp in nodes_data] + already_source_ids)
         )
-
-        await knowledge_graph_inst.upsert_edge(
-            hyper_relation,
-            entity_name,
-            edge_data=dict(
+        edge_data.append(
+            dict(
+                src_id=hyper_relation,
+                tgt_id=entity_name,
                 weight=weight,
                 source_id=source_id,
-            ),
+                hyperedge_tokens=count_tokens_by_tiktoken(hyper_relation),
+            )
         )
 
-        edge_data.append(dict(
-            src_id=hyper_relation,
-            tgt_id=entity_name,
-            weight=weight,
-        ))
-
+    await knowledge_graph_inst.upsert_edges(
+        [
+            (
+                dp["src_id"],
+                dp["tgt_id"],
+                dict(
+                    weight=dp["weight"],
+                    source_id=dp["source_id"],
+                    hyperedge_tokens=dp["hyperedge_tokens"],
+                ),
+            )
+            for dp in edge_data
+        ]
+    )
     return edge_data
 
 
+async def _merged_chunk_keys(
+    results: list[tuple[str, dict, dict]], knowledge_graph_inst: BaseGraphStorage
+) -> set[str]:
+    """Keys of checkpointed chunks whose records already reached the graph.
+
+    Merging a chunk adds its key to the source_id of everything it touches.
+    Edges are written last, so a chunk counts as merged once all of its edges
+    (or, without entities, all of its hyperedges) carry the key.
+    """
+    targets = {}
+    for chunk_key, nodes, edges in results:
+        targets[chunk_key] = [
+            (node["hyper_relation"], entity_name)
+            for entity_name, entity_nodes in nodes.items()
+            for node in entity_nodes
+        ] or list(edges)
+    edge_pairs = list(
+        {t for ts in targets.values() for t in ts if isinstance(t, tuple)}
+    )
+    hyperedge_names = list(
+        {t for ts in targets.values() for t in ts if isinstance(t, str)}
+    )
+    found = {}
+    if edge_pairs:
+        found.update(zip(edge_pairs, await knowledge_graph_inst.get_edges(edge_pairs)))
+    if hyperedge_names:
+        found.update(
+            zip(hyperedge_names, await knowledge_graph_inst.get_nodes(hyperedge_names))
+        )
+    return {
+        chunk_key
+        for chunk_key, chunk_targets in targets.items()
+        if chunk_targets
+        and all(
+            found[t] is not None
+            and chunk_key
+            in split_string_by_multi_markers(found[t]["source_id"], [GRAPH_FIELD_SEP])
+            for t in chunk_targets
+        )
+    }
+
+
 async def extract_entities(
-    chunks: dict[str, TextChunkSchema],
+    chunks: Union[
+        dict[str, TextChunkSchema], AsyncIterator[dict[str, TextChunkSchema]]
+    ],
     knowledge_graph_inst: BaseGraphStorage,
     entity_vdb: BaseVectorStorage,
     hyperedge_vdb: BaseVectorStorage,
     global_config: dict,
+    checkpoint_kv: BaseKVStorage = None,
 ) -> Union[BaseGraphStorage, None]:
+    """Extract hyperedges and entities from chunks and merge them into the graph.
+
+    ``chunks`` is a dict or an async iterator of dicts, read while earlier
+    chunks are still in flight. The work runs as concurrent stages joined by
+    bounded queues of ``pipeline_queue_size``: ``llm_model_max_async``
+    extraction workers, one merge worker that folds every result ready so far
+    into the graph, and a writer that embeds the merged hyperedges and
+    entities once ``pipeline_vdb_flush_size`` of them are pending.
+
+    With ``checkpoint_kv`` the parsed records of every chunk are persisted as
+    soon as the chunk is done, and chunks found there are not sent to the LLM
+    again, so an interrupted insert resumes where it stopped.
+    """
     use_llm_func: callable = global_config["llm_model_func"]
     entity_extract_max_gleaning = global_config["entity_extract_max_gleaning"]
-
-    ordered_chunks = list(chunks.items())
+    stream_kwargs = {"stream": True} if global_config["entity_extract_stream"] else {}
+    num_workers = global_config["llm_model_max_async"]
+    queue_size = global_config["pipeline_queue_size"]
+    vdb_flush_size = global_config["pipeline_vdb_flush_size"]
     # add language and example number params to prompt
     language = global_config["addon_params"].get(
         "language", PROMPTS["DEFAULT_LANGUAGE"]
@@ -321,13 +449,61 @@ async def extract_entities(
             **context_base, input_text="{input_text}"
         ).format(**context_base, input_text=content)
 
-        final_result = await use_llm_func(hint_prompt)
+        maybe_nodes = defaultdict(list)
+        maybe_edges = defaultdict(list)
+        now_hyper_relation = ""
+        # One parser spans every round, like the concatenated replies did
+        parser = RecordStreamParser(
+            [context_base["record_delimiter"], context_base["completion_delimiter"]]
+        )
+
+        async def _handle_records(records: list[str]):
+            nonlocal now_hyper_relation
+            for record in records:
+                record = _RECORD_BODY.search(record)
+                if record is None:
+                    continue
+                record = record.group(1)
+                record_attributes = split_string_by_multi_markers(
+                    record, [context_base["tuple_delimiter"]]
+                )
+                if_relation = await _handle_single_hyperrelation_extraction(
+                    record_attributes, chunk_key
+                )
+                if if_relation is not None:
+                    maybe_edges[if_relation["hyper_relation"]].append(if_relation)
+                    now_hyper_relation = if_relation["hyper_relation"]
+
+                if_entities = await _handle_single_entity_extraction(
+                    record_attributes, chunk_key, now_hyper_relation
+                )
+                if if_entities is not None:
+                    maybe_nodes[if_entities["entity_name"]].append(if_entities)
+
+        async def _extract(prompt: str, **kwargs) -> str:
+            # Records are handled as soon as they complete, the full reply is
+            # only kept for the gleaning history
+            response = await use_llm_func(prompt, **stream_kwargs, **kwargs)
+            if isinstance(response, str):
+                await _handle_records(parser.feed(response))
+                return response
+            pieces = []
+            try:
+                async for piece in response:
+                    pieces.append(piece)
+                    await _handle_records(parser.feed(piece))
+            finally:
+                # frees the llm_model_max_async slot the stream holds
+                if hasattr(response, "aclose"):
+                    await response.aclose()
+            return "".join(pieces)
+
+        final_result = await _extract(hint_prompt)
         history = pack_user_ass_to_openai_messages(hint_prompt, final_result)
         for now_glean_index in range(entity_extract_max_gleaning):
-            glean_result = await use_llm_func(continue_prompt, history_messages=history)
+            glean_result = await _extract(continue_prompt, history_messages=history)
 
             history += pack_user_ass_to_openai_messages(continue_prompt, glean_result)
-            final_result += glean_result
             if now_glean_index == entity_extract_max_gleaning - 1:
                 break
 
@@ -337,39 +513,8 @@ async def extract_entities(
             if_loop_result = if_loop_result.strip().strip('"').strip("'").lower()
             if if_loop_result != "yes":
                 break
+        await _handle_records(parser.close())
 
-        records = split_string_by_multi_markers(
-            final_result,
-            [context_base["record_delimiter"], context_base["completion_delimiter"]],
-        )
-
-        maybe_nodes = defaultdict(list)
-        maybe_edges = defaultdict(list)
-        now_hyper_relation=""
-        for record in records:
-            record = re.search(r"\((.*)\)", record)
-            if record is None:
-                continue
-            record = record.group(1)
-            record_attributes = split_string_by_multi_markers(
-                record, [context_base["tuple_delimiter"]]
-            )
-            if_relation = await _handle_single_hyperrelation_extraction(
-                record_attributes, chunk_key
-            )
-            if if_relation is not None:
-                maybe_edges[if_relation["hyper_relation"]].append(
-                    if_relation
-                )
-                now_hyper_relation = if_relation["hyper_relation"]
-                
-            if_entities = await _handle_single_entity_extraction(
-                record_attributes, chunk_key, now_hyper_relation
-            )
-            if if_entities is not None:
-                maybe_nodes[if_entities["entity_name"]].append(if_entities)
-                continue
-            
         already_processed += 1
         already_entities += len(maybe_nodes)
         already_relations += len(maybe_edges)
@@ -381,103 +526,222 @@ async def extract_entities(
             end="",
             flush=True,
         )
+        if checkpoint_kv is not None:
+            await checkpoint_kv.upsert(
+                {chunk_key: {"nodes": dict(maybe_nodes), "edges": dict(maybe_edges)}}
+            )
+            await checkpoint_kv.index_done_callback()
         return dict(maybe_nodes), dict(maybe_edges)
 
-    results = []
-    for result in tqdm_async(
-        asyncio.as_completed([_process_single_content(c) for c in ordered_chunks]),
-        total=len(ordered_chunks),
+    chunk_queue = asyncio.Queue(maxsize=queue_size)
+    result_queue = asyncio.Queue(maxsize=queue_size)
+    vdb_queue = asyncio.Queue(maxsize=queue_size)
+    merge_rounds = []
+    merged_chunks = 0
+    merged_hyperedges = 0
+    merged_entities = 0
+    merged_relationships = 0
+    pbar = tqdm_async(
+        total=len(chunks) if isinstance(chunks, dict) else None,
         desc="Extracting entities from chunks",
         unit="chunk",
-    ):
-        results.append(await result)
-
-    maybe_nodes = defaultdict(list)
-    maybe_edges = defaultdict(list)
-    for m_nodes, m_edges in results:
-        for k, v in m_nodes.items():
-            maybe_nodes[k].extend(v)
-        for k, v in m_edges.items():
-            maybe_edges[k].extend(v)
-            
-    logger.info("Inserting hyperedges into storage...")
-    all_hyperedges_data = []
-    for result in tqdm_async(
-        asyncio.as_completed(
-            [
-                _merge_hyperedges_then_upsert(k, v, knowledge_graph_inst, global_config)
-                for k, v in maybe_edges.items()
-            ]
-        ),
-        total=len(maybe_edges),
-        desc="Inserting hyperedges",
-        unit="entity",
-    ):
-        all_hyperedges_data.append(await result)
-            
-    logger.info("Inserting entities into storage...")
-    all_entities_data = []
-    for result in tqdm_async(
-        asyncio.as_completed(
-            [
-                _merge_nodes_then_upsert(k, v, knowledge_graph_inst, global_config)
-                for k, v in maybe_nodes.items()
-            ]
-        ),
-        total=len(maybe_nodes),
-        desc="Inserting entities",
-        unit="entity",
-    ):
-        all_entities_data.append(await result)
+    )
 
-    logger.info("Inserting relationships into storage...")
-    all_relationships_data = []
-    for result in tqdm_async(
-        asyncio.as_completed(
-            [
-                _merge_edges_then_upsert(k, v, knowledge_graph_inst, global_config)
-                for k, v in maybe_nodes.items()
-            ]
-        ),
-        total=len(maybe_nodes),
-        desc="Inserting relationships",
-        unit="relationship",
-    ):
-        all_relationships_data.append(await result)
+    async def _chunk_batches():
+        if isinstance(chunks, dict):
+            yield chunks
+            return
+        async for batch in chunks:
+            yield batch
+
+    async def _feed_chunks():
+        async for batch in _chunk_batches():
+            ordered_chunks = list(batch.items())
+            if checkpoint_kv is not None:
+                checkpoints = await checkpoint_kv.get_by_ids(
+                    [k for k, _ in ordered_chunks]
+                )
+                restored = [
+                    (k, cp["nodes"], cp["edges"], True)
+                    for (k, _), cp in zip(ordered_chunks, checkpoints)
+                    if cp is not None
+                ]
+                ordered_chunks = [
+                    c for c, cp in zip(ordered_chunks, checkpoints) if cp is None
+                ]
+                if restored:
+                    logger.info(
+                        f"Resume extraction, {len(restored)} chunks from checkpoint"
+                    )
+                for result in restored:
+                    await result_queue.put(result)
+                    pbar.update(1)
+            for chunk in ordered_chunks:
+                await chunk_queue.put(chunk)
+        for _ in range(num_workers):
+            await chunk_queue.put(None)
+
+    async def _extract_chunks():
+        while True:
+            chunk = await chunk_queue.get()
+            if chunk is None:
+                return
+            m_nodes, m_edges = await _process_single_content(chunk)
+            # A chunk is merged whole, not per streamed record or round. Its
+            # entities bind to the last hyper-relation seen, possibly in an
+            # earlier round, and the checkpoint only holds finished chunks,
+            # so a partly merged chunk would be merged twice on resume
+            await result_queue.put((chunk[0], m_nodes, m_edges, False))
+            pbar.update(1)
+
+    async def _close_results(producers):
+        await asyncio.gather(*producers)
+        await result_queue.put(None)
+
+    async def _merge_round(results: list[tuple]) -> tuple[list[dict], list[dict]]:
+        nonlocal merged_chunks, merged_hyperedges
+        nonlocal merged_entities, merged_relationships
+        merged_chunks += len(results)
+        restored = [r[:3] for r in results if r[3]]
+        merged_keys = (
+            await _merged_chunk_keys(restored, knowledge_graph_inst)
+            if restored
+            else set()
+        )
+        maybe_nodes = defaultdict(list)
+        maybe_edges = defaultdict(list)
+        refresh_names = set()
+        for chunk_key, m_nodes, m_edges, _ in results:
+            if chunk_key in merged_keys:
+                refresh_names.update(m_nodes)
+                refresh_names.update(m_edges)
+                continue
+            for k, v in m_nodes.items():
+                maybe_nodes[k].extend(v)
+            for k, v in m_edges.items():
+                maybe_edges[k].extend(v)
+
+        hyperedges_data, entities_data, relationships_data = [], [], []
+        if maybe_edges or maybe_nodes:
+            hyperedges_data = await _merge_hyperedges_then_upsert(
+                maybe_edges, knowledge_graph_inst, global_config
+            )
+            entities_data = await _merge_nodes_then_upsert(
+                maybe_nodes, knowledge_graph_inst, global_config
+            )
+            relationships_data = await _merge_edges_then_upsert(
+                maybe_nodes, knowledge_graph_inst, global_config
+            )
 
-    if not len(all_hyperedges_data) and not len(all_entities_data) and not len(all_relationships_data):
+        # Chunks merged before an interruption only need their vectors
+        refresh_names = [
+            name
+            for name in refresh_names
+            if name not in maybe_nodes and name not in maybe_edges
+        ]
+        if refresh_names:
+            for name, node in zip(
+                refresh_names, await knowledge_graph_inst.get_nodes(refresh_names)
+            ):
+                if node is None:
+                    continue
+                if node.get("role") == "hyperedge":
+                    hyperedges_data.append({**node, "hyperedge_name": name})
+                elif node.get("role") == "entity":
+                    entities_data.append({**node, "entity_name": name})
+
+        merged_hyperedges += len(hyperedges_data)
+        merged_entities += len(entities_data)
+        merged_relationships += len(relationships_data)
+        return hyperedges_data, entities_data
+
+    async def _merge_results():
+        # The only writer of the graph, so merges never race on the same node
+        done = False
+        while not done:
+            results = [await result_queue.get()]
+            while not result_queue.empty():
+                results.append(result_queue.get_nowait())
+            done = results[-1] is None
+            results = [r for r in results if r is not None]
+            # Shielded so a failing stage never leaves a round half written,
+            # which a resume could not tell apart from an unmerged chunk
+            merge_rounds.append(asyncio.create_task(_merge_round(results)))
+            hyperedges_data, entities_data = await asyncio.shield(merge_rounds[-1])
+            if hyperedges_data or entities_data:
+                await vdb_queue.put((hyperedges_data, entities_data))
+        await vdb_queue.put(None)
+
+    async def _write_vdbs():
+        # Keyed by vector id, so a node merged again before its batch is
+        # written is embedded once, with its latest description
+        pending_hyperedges = {}
+        pending_entities = {}
+        done = False
+        while not done:
+            items = [await vdb_queue.get()]
+            while not vdb_queue.empty():
+                items.append(vdb_queue.get_nowait())
+            done = items[-1] is None
+            for hyperedges_data, entities_data in filter(None, items):
+                if hyperedge_vdb is not None:
+                    for dp in hyperedges_data:
+                        pending_hyperedges[
+                            compute_mdhash_id(dp["hyperedge_name"], prefix="rel-")
+                        ] = {
+                            "content": dp["hyperedge_name"],
+                            "hyperedge_name": dp["hyperedge_name"],
+                        }
+                if entity_vdb is not None:
+                    for dp in entities_data:
+                        pending_entities[
+                            compute_mdhash_id(dp["entity_name"], prefix="ent-")
+                        ] = {
+                            "content": dp["entity_name"] + dp["description"],
+                            "entity_name": dp["entity_name"],
+                        }
+            upserts = []
+            if pending_hyperedges and (
+                done or len(pending_hyperedges) >= vdb_flush_size
+            ):
+                upserts.append(hyperedge_vdb.upsert(pending_hyperedges))
+                pending_hyperedges = {}
+            if pending_entities and (done or len(pending_entities) >= vdb_flush_size):
+                upserts.append(entity_vdb.upsert(pending_entities))
+                pending_entities = {}
+            await asyncio.gather(*upserts)
+
+    producers = [asyncio.create_task(_feed_chunks())] + [
+        asyncio.create_task(_extract_chunks()) for _ in range(num_workers)
+    ]
+    stages = producers + [
+        asyncio.create_task(_close_results(producers)),
+        asyncio.create_task(_merge_results()),
+        asyncio.create_task(_write_vdbs()),
+    ]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        for task in stages:
+            task.cancel()
+        await asyncio.gather(*merge_rounds, return_exceptions=True)
+        pbar.close()
+
+    if not merged_chunks:
+        return None
+    if not merged_hyperedges and not merged_entities and not merged_relationships:
         logger.warning(
             "Didn't extract any hyperedges and entities, maybe your LLM is not working"
         )
         return None
 
-    if not len(all_hyperedges_data):
+    if not merged_hyperedges:
         logger.warning("Didn't extract any hyperedges")
-    if not len(all_entities_data):
+    if not merged_entities:
         logger.warning("Didn't extract any entities")
-    if not len(all_relationships_data):
+    if not merged_relationships:
         logger.warning("Didn't extract any relationships")
 
-    if hyperedge_vdb is not None:
-        data_for_vdb = {
-            compute_mdhash_id(dp["hyperedge_name"], prefix="rel-"): {
-                "content": dp["hyperedge_name"],
-                "hyperedge_name": dp["hyperedge_name"],
-            }
-            for dp in all_hyperedges_data
-        }
-        await hyperedge_vdb.upsert(data_for_vdb)
-
-    if entity_vdb is not None:
-        data_for_vdb = {
-            compute_mdhash_id(dp["entity_name"], prefix="ent-"): {
-                "content": dp["entity_name"] + dp["description"],
-                "entity_name": dp["entity_name"],
-            }
-            for dp in all_entities_data
-        }
-        await entity_vdb.upsert(data_for_vdb)
-
     return knowledge_graph_inst
 
 
@@ -549,7 +813,7 @@ async def kg_query(
             [context_base["record_delimiter"], context_base["completion_delimiter"]],
         )
         for record in records:
-            record = re.search(r"\((.*)\)", record)
+            record = _RECORD_BODY.search(record)
             if record is None:
                 continue
             record = record.group(1)
@@ -744,16 +1008,13 @@ async def _get_node_data(
     if not len(results):
         return "", "", ""
     # get entity information
-    node_datas = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(r["entity_name"]) for r in results]
-    )
+    entity_names = [r["entity_name"] for r in results]
+    node_datas = await knowledge_graph_inst.get_nodes(entity_names)
     if not all([n is not None for n in node_datas]):
         logger.warning("Some nodes are missing, maybe the storage is damaged")
 
     # get entity degree
-    node_degrees = await asyncio.gather(
-        *[knowledge_graph_inst.node_degree(r["entity_name"]) for r in results]
-    )
+    node_degrees = await knowledge_graph_inst.node_degrees(entity_names)
     node_datas = [
         {**n, "entity_name": k["entity_name"], "rank": d}
         for k, n, d in zip(results, node_datas, node_degrees)
@@ -814,8 +1075,8 @@ async def _find_most_related_text_unit_from_entities(
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
         for dp in node_datas
     ]
-    edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
+    edges = await knowledge_graph_inst.get_nodes_edges(
+        [dp["entity_name"] for dp in node_datas]
     )
     all_one_hop_nodes = set()
     for this_edges in edges:
@@ -824,9 +1085,7 @@ async def _find_most_related_text_unit_from_entities(
         all_one_hop_nodes.update([e[1] for e in this_edges])
 
     all_one_hop_nodes = list(all_one_hop_nodes)
-    all_one_hop_nodes_data = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(e) for e in all_one_hop_nodes]
-    )
+    all_one_hop_nodes_data = await knowledge_graph_inst.get_nodes(all_one_hop_nodes)
 
     # Add null check for node data
     all_one_hop_text_units_lookup = {
@@ -872,6 +1131,7 @@ async def _find_most_related_text_unit_from_entities(
         all_text_units,
         key=lambda x: x["data"]["content"],
         max_token_size=query_param.max_token_for_text_unit,
+        token_count=lambda x: x["data"].get("tokens"),
     )
 
     all_text_units = [t["data"] for t in all_text_units]
@@ -883,8 +1143,8 @@ async def _find_most_related_edges_from_entities(
     query_param: QueryParam,
     knowledge_graph_inst: BaseGraphStorage,
 ):
-    all_related_edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
+    all_related_edges = await knowledge_graph_inst.get_nodes_edges(
+        [dp["entity_name"] for dp in node_datas]
     )
     all_edges = []
     seen = set()
@@ -896,12 +1156,8 @@ async def _find_most_related_edges_from_entities(
                 seen.add(sorted_edge)
                 all_edges.append(sorted_edge)
 
-    all_edges_pack = await asyncio.gather(
-        *[knowledge_graph_inst.get_edge(e[0], e[1]) for e in all_edges]
-    )
-    all_edges_degree = await asyncio.gather(
-        *[knowledge_graph_inst.edge_degree(e[0], e[1]) for e in all_edges]
-    )
+    all_edges_pack = await knowledge_graph_inst.get_edges(all_edges)
+    all_edges_degree = await knowledge_graph_inst.edge_degrees(all_edges)
     all_edges_data = [
         {"src_tgt": k, "rank": d, "description": k[1], **v}
         for k, v, d in zip(all_edges, all_edges_pack, all_edges_degree)
@@ -914,9 +1170,10 @@ async def _find_most_related_edges_from_entities(
         all_edges_data,
         key=lambda x: x["description"],
         max_token_size=query_param.max_token_for_global_context,
+        token_count=lambda x: x.get("hyperedge_tokens"),
     )
-    all_related_nodes = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(edge["src_tgt"][1]) for edge in all_edges_data]
+    all_related_nodes = await knowledge_graph_inst.get_nodes_edges(
+        [edge["src_tgt"][1] for edge in all_edges_data]
     )
     all_nodes = []
     for this_nodes in all_related_nodes:
@@ -940,8 +1197,8 @@ async def _get_edge_data(
     if not len(results):
         return "", "", ""
 
-    edge_datas = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(r["hyperedge_name"]) for r in results]
+    edge_datas = await knowledge_graph_inst.get_nodes(
+        [r["hyperedge_name"] for r in results]
     )
 
     if not all([n is not None for n in edge_datas]):
@@ -961,9 +1218,10 @@ async def _get_edge_data(
         edge_datas,
         key=lambda x: x["hyperedge"],
         max_token_size=query_param.max_token_for_global_context,
+        token_count=lambda x: x.get("hyperedge_tokens"),
     )
-    all_related_nodes = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(edge["hyperedge"]) for edge in edge_datas]
+    all_related_nodes = await knowledge_graph_inst.get_nodes_edges(
+        [edge["hyperedge"] for edge in edge_datas]
     )
     all_nodes = []
     for this_nodes in all_related_nodes:
@@ -1021,8 +1279,8 @@ async def _find_most_related_entities_from_relationships(
     knowledge_graph_inst: BaseGraphStorage,
 ):
     
-    node_datas = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(edge["hyperedge"]) for edge in edge_datas]
+    node_datas = await knowledge_graph_inst.get_nodes_edges(
+        [edge["hyperedge"] for edge in edge_datas]
     )
     
     entity_names = []
@@ -1034,13 +1292,9 @@ async def _find_most_related_entities_from_relationships(
                 entity_names.append(e[1])
                 seen.add(e[1])
 
-    node_datas = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(entity_name) for entity_name in entity_names]
-    )
+    node_datas = await knowledge_graph_inst.get_nodes(entity_names)
 
-    node_degrees = await asyncio.gather(
-        *[knowledge_graph_inst.node_degree(entity_name) for entity_name in entity_names]
-    )
+    node_degrees = await knowledge_graph_inst.node_degrees(entity_names)
     node_datas = [
         {**n, "entity_name": k, "rank": d}
         for k, n, d in zip(entity_names, node_datas, node_degrees)
@@ -1050,6 +1304,7 @@ async def _find_most_related_entities_from_relationships(
         node_datas,
         key=lambda x: x["description"],
         max_token_size=query_param.max_token_for_local_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
 
     return node_datas
@@ -1098,6 +1353,7 @@ async def _find_related_text_unit_from_relationships(
         valid_text_units,
         key=lambda x: x["data"]["content"],
         max_token_size=query_param.max_token_for_text_unit,
+        token_count=lambda x: x["data"].get("tokens"),
     )
 
     all_text_units: list[TextChunkSchema] = [t["data"] for t in truncated_text_units]
@@ -1,8 +1,13 @@
 import asyncio
 import html
+import json
 import os
+import queue
+import sqlite3
+import threading
 from tqdm.asyncio import tqdm as tqdm_async
 from dataclasses import dataclass
+from functools import partial
 from typing import Any, Union, cast
 import networkx as nx
 import numpy as np
@@ -24,17 +29,145 @@ from .base import (
 
 @dataclass
 class JsonKVStorage(BaseKVStorage):
+    """KV storage kept in memory and persisted as one JSON file per namespace.
+
+    With ``kv_storage_cls_kwargs={"journal": True}`` the storage is
+    log-structured: ``index_done_callback`` only appends the keys changed since
+    the last call to ``kv_store_{namespace}.journal`` and the JSON snapshot is
+    rewritten by a background compaction once the journal outgrows it. Startup
+    replays the snapshot plus the journal. Values are treated as immutable once
+    upserted, so upsert a new value instead of mutating one in place.
+    """
+
     def __post_init__(self):
         working_dir = self.global_config["working_dir"]
         self._file_name = os.path.join(working_dir, f"kv_store_{self.namespace}.json")
+        self._journal_file_name = os.path.join(
+            working_dir, f"kv_store_{self.namespace}.journal"
+        )
+        self._compacting_journal_file_name = self._journal_file_name + ".compacting"
+        storage_kwargs = self.global_config.get("kv_storage_cls_kwargs", {})
+        self._use_journal = storage_kwargs.get("journal", False)
+        self._compaction_ratio = storage_kwargs.get("journal_compaction_ratio", 1.0)
+        self._compaction_min_bytes = storage_kwargs.get(
+            "journal_compaction_min_bytes", 16 * 1024 * 1024
+        )
+        self._compaction_task = None
+        self._dirty_keys = set()
+        self._cleared = False
         self._data = load_json(self._file_name) or {}
+        self._replay_journal()
         logger.info(f"Load KV {self.namespace} with {len(self._data)} data")
 
+    def _replay_journal(self):
+        # a leftover ".compacting" journal means a compaction did not finish,
+        # it holds older changes than the active journal
+        for file_name in [self._compacting_journal_file_name, self._journal_file_name]:
+            if not os.path.exists(file_name):
+                continue
+            replayed = 0
+            with open(file_name, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a torn write at the tail of the journal
+                        logger.warning(f"Skip truncated journal entry in {file_name}")
+                        continue
+                    if entry["op"] == "put":
+                        self._data[entry["key"]] = entry["value"]
+                    elif entry["op"] == "delete":
+                        self._data.pop(entry["key"], None)
+                    elif entry["op"] == "clear":
+                        self._data = {}
+                    replayed += 1
+            logger.info(f"Replayed {replayed} journal entries from {file_name}")
+
+    def _append_journal(self):
+        if not self._cleared and not self._dirty_keys:
+            return
+        entries = [{"op": "clear"}] if self._cleared else []
+        entries.extend(
+            (
+                {"op": "put", "key": k, "value": self._data[k]}
+                if k in self._data
+                else {"op": "delete", "key": k}
+            )
+            for k in self._dirty_keys
+        )
+        with open(self._journal_file_name, "a", encoding="utf-8") as f:
+            f.write(
+                "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        self._dirty_keys.clear()
+        self._cleared = False
+
+    def _need_compaction(self) -> bool:
+        if not os.path.exists(self._journal_file_name):
+            return False
+        snapshot_size = (
+            os.path.getsize(self._file_name) if os.path.exists(self._file_name) else 0
+        )
+        return os.path.getsize(self._journal_file_name) >= max(
+            self._compaction_min_bytes, self._compaction_ratio * snapshot_size
+        )
+
+    def _start_compaction(self):
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return
+        if os.path.exists(self._compacting_journal_file_name):
+            # the previous compaction failed, keep its journal and extend it
+            with open(self._journal_file_name, encoding="utf-8") as src, open(
+                self._compacting_journal_file_name, "a", encoding="utf-8"
+            ) as dst:
+                dst.write(src.read())
+            os.remove(self._journal_file_name)
+        else:
+            os.replace(self._journal_file_name, self._compacting_journal_file_name)
+        # shallow copy: the background thread only needs a stable key set
+        snapshot = dict(self._data)
+        loop = asyncio.get_running_loop()
+        self._compaction_task = loop.run_in_executor(
+            None, self._write_snapshot, snapshot
+        )
+        self._compaction_task.add_done_callback(self._on_compaction_done)
+
+    def _write_snapshot(self, snapshot: dict):
+        tmp_file_name = self._file_name + ".tmp"
+        write_json(snapshot, tmp_file_name)
+        os.replace(tmp_file_name, self._file_name)
+        os.remove(self._compacting_journal_file_name)
+
+    def _on_compaction_done(self, task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error(
+                f"Compaction of KV {self.namespace} failed: {task.exception()}"
+            )
+        else:
+            logger.info(f"Compacted KV {self.namespace} with {len(self._data)} data")
+
     async def all_keys(self) -> list[str]:
         return list(self._data.keys())
 
     async def index_done_callback(self):
+        if self._use_journal:
+            self._append_journal()
+            if self._need_compaction():
+                self._start_compaction()
+            return
         write_json(self._data, self._file_name)
+        self._dirty_keys.clear()
+        self._cleared = False
+        # the full snapshot supersedes journals left by a journaled run
+        for file_name in [self._compacting_journal_file_name, self._journal_file_name]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
 
     async def get_by_id(self, id):
         return self._data.get(id, None)
@@ -56,11 +189,185 @@ class JsonKVStorage(BaseKVStorage):
 
     async def upsert(self, data: dict[str, dict]):
         left_data = {k: v for k, v in data.items() if k not in self._data}
-        self._data.update(left_data)
+        self._data.update(data)
+        self._dirty_keys.update(data.keys())
         return left_data
 
+    async def delete(self, ids: list[str]):
+        for id in ids:
+            if self._data.pop(id, None) is not None:
+                self._dirty_keys.add(id)
+
     async def drop(self):
         self._data = {}
+        self._dirty_keys.clear()
+        self._cleared = True
+
+
+class SQLiteConnectionPool:
+    """A thread-safe pool of connections to one SQLite database file."""
+
+    def __init__(self, db_file: str, max_size: int = 4):
+        self._db_file = db_file
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_file, timeout=30, check_same_thread=False)
+        # WAL lets readers in other processes run concurrently with a writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def run(self, func: callable):
+        """Call ``func(conn)`` with a pooled connection, blocking while all are busy"""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                return func(conn)
+            finally:
+                self._idle.put(conn)
+
+
+_sqlite_pools: dict[str, SQLiteConnectionPool] = {}
+_sqlite_pools_lock = threading.Lock()
+
+
+def get_sqlite_pool(db_file: str, max_size: int = 4) -> SQLiteConnectionPool:
+    """Return the process-wide connection pool of a database file"""
+    db_file = os.path.abspath(db_file)
+    with _sqlite_pools_lock:
+        if db_file not in _sqlite_pools:
+            _sqlite_pools[db_file] = SQLiteConnectionPool(db_file, max_size=max_size)
+        return _sqlite_pools[db_file]
+
+
+@dataclass
+class SQLiteKVStorage(BaseKVStorage):
+    """KV storage in ``kv_store_{namespace}.sqlite``, one JSON value per key.
+
+    Lookups and writes are indexed SQL statements run on a shared connection
+    pool off the event loop, so nothing is held in memory and several
+    processes can read the same ``working_dir``.
+    """
+
+    def __post_init__(self):
+        self._db_file = os.path.join(
+            self.global_config["working_dir"], f"kv_store_{self.namespace}.sqlite"
+        )
+        storage_kwargs = self.global_config.get("kv_storage_cls_kwargs", {})
+        self._max_batch_size = storage_kwargs.get("sqlite_batch_size", 500)
+        self._pool = get_sqlite_pool(
+            self._db_file, max_size=storage_kwargs.get("sqlite_pool_size", 4)
+        )
+        self._pool.run(self._create_table)
+        # "->" returns the JSON text of a field, available since SQLite 3.38
+        self._json_arrow = sqlite3.sqlite_version_info >= (3, 38, 0)
+        logger.info(f"Use SQLite as KV {self.namespace} at {self._db_file}")
+
+    @staticmethod
+    def _create_table(conn: sqlite3.Connection):
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (id TEXT PRIMARY KEY, value TEXT NOT NULL)"
+                " WITHOUT ROWID"
+            )
+
+    async def _run(self, func: callable, *args):
+        return await asyncio.to_thread(self._pool.run, partial(func, *args))
+
+    def _batches(self, items: list) -> list[list]:
+        return [
+            items[i : i + self._max_batch_size]
+            for i in range(0, len(items), self._max_batch_size)
+        ]
+
+    async def all_keys(self) -> list[str]:
+        def _all_keys(conn):
+            return [row[0] for row in conn.execute("SELECT id FROM kv")]
+
+        return await self._run(_all_keys)
+
+    async def get_by_id(self, id):
+        return (await self.get_by_ids([id]))[0]
+
+    async def get_by_ids(self, ids, fields=None):
+        fields = list(fields) if fields is not None else None
+
+        def _get_by_ids(conn):
+            found = {}
+            for batch in self._batches(list(ids)):
+                placeholders = ",".join("?" * len(batch))
+                if fields is not None and self._json_arrow:
+                    columns = ",".join(["value -> ?"] * len(fields))
+                    rows = conn.execute(
+                        f"SELECT id, {columns} FROM kv WHERE id IN ({placeholders})",
+                        [f'$."{f}"' for f in fields] + batch,
+                    )
+                    for row in rows:
+                        found[row[0]] = {
+                            f: json.loads(v)
+                            for f, v in zip(fields, row[1:])
+                            if v is not None
+                        }
+                    continue
+                rows = conn.execute(
+                    f"SELECT id, value FROM kv WHERE id IN ({placeholders})", batch
+                )
+                for row in rows:
+                    value = json.loads(row[1])
+                    if fields is not None:
+                        value = {k: v for k, v in value.items() if k in fields}
+                    found[row[0]] = value
+            return [found.get(id, None) for id in ids]
+
+        return await self._run(_get_by_ids)
+
+    async def filter_keys(self, data: list[str]) -> set[str]:
+        def _filter_keys(conn):
+            exist_keys = set()
+            for batch in self._batches(list(data)):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT id FROM kv WHERE id IN ({placeholders})", batch
+                )
+                exist_keys.update(row[0] for row in rows)
+            return set([s for s in data if s not in exist_keys])
+
+        return await self._run(_filter_keys)
+
+    async def upsert(self, data: dict[str, dict]):
+        rows = [(k, json.dumps(v, ensure_ascii=False)) for k, v in data.items()]
+
+        def _upsert(conn):
+            with conn:
+                conn.executemany(
+                    "INSERT INTO kv (id, value) VALUES (?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET value = excluded.value",
+                    rows,
+                )
+
+        await self._run(_upsert)
+        return data
+
+    async def delete(self, ids: list[str]):
+        def _delete(conn):
+            with conn:
+                for batch in self._batches(list(ids)):
+                    placeholders = ",".join("?" * len(batch))
+                    conn.execute(f"DELETE FROM kv WHERE id IN ({placeholders})", batch)
+
+        await self._run(_delete)
+
+    async def drop(self):
+        def _drop(conn):
+            with conn:
+                conn.execute("DELETE FROM kv")
+
+        await self._run(_drop)
 
 
 @dataclass
@@ -68,17 +375,84 @@ class NanoVectorDBStorage(BaseVectorStorage):
     cosine_better_than_threshold: float = 0.2
 
     def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
         self._client_file_name = os.path.join(
-            self.global_config["working_dir"], f"vdb_{self.namespace}.json"
+            working_dir, f"vdb_{self.namespace}.json"
+        )
+        # Binary layout: the normalized matrix as a raw .npy file that is
+        # memory-mapped on load, ids and meta fields in a small JSON side file
+        self._meta_file_name = os.path.join(
+            working_dir, f"vdb_{self.namespace}.meta.json"
         )
         self._max_batch_size = self.global_config["embedding_batch_num"]
+        meta = load_json(self._meta_file_name)
+        # Skip decoding the legacy JSON file when a binary snapshot exists
         self._client = NanoVectorDB(
-            self.embedding_func.embedding_dim, storage_file=self._client_file_name
+            self.embedding_func.embedding_dim,
+            storage_file=self._client_file_name if meta is None else "",
         )
+        self._client.storage_file = self._client_file_name
+        self._matrix_version = 0
+        # entity name -> ids of the records with it as src_id or tgt_id, and
+        # the reverse to unindex a record without looking it up
+        self._relation_index: dict[str, set[str]] = {}
+        self._relation_names: dict[str, set[str]] = {}
+        if meta is not None:
+            self._load_binary(meta)
+        if meta is None or "relation_index" not in meta:
+            for dp in self.client_storage["data"]:
+                self._index_relation(dp)
         self.cosine_better_than_threshold = self.global_config.get(
             "cosine_better_than_threshold", self.cosine_better_than_threshold
         )
 
+    def _matrix_file_name(self, version: int) -> str:
+        return os.path.join(
+            self.global_config["working_dir"], f"vdb_{self.namespace}.{version}.npy"
+        )
+
+    def _load_binary(self, meta: dict):
+        assert (
+            meta["embedding_dim"] == self.embedding_func.embedding_dim
+        ), f"Embedding dim mismatch, expected: {self.embedding_func.embedding_dim}, but loaded: {meta['embedding_dim']}"
+        self._matrix_version = meta["matrix_version"]
+        # Copy-on-write mapping: pages are shared between processes until an
+        # upsert writes into a row of this process' matrix
+        matrix = np.load(self._matrix_file_name(self._matrix_version), mmap_mode="c")
+        storage = self.client_storage
+        storage["matrix"] = matrix
+        storage["data"] = meta["data"]
+        if "additional_data" in meta:
+            storage["additional_data"] = meta["additional_data"]
+        for entity_name, ids in meta.get("relation_index", {}).items():
+            self._relation_index[entity_name] = set(ids)
+            for id_ in ids:
+                self._relation_names.setdefault(id_, set()).add(entity_name)
+        logger.info(f"Load VDB {self.namespace} with {matrix.shape} memory-mapped data")
+
+    def _save_binary(self):
+        storage = self.client_storage
+        version = self._matrix_version + 1
+        with open(self._matrix_file_name(version), "wb") as f:
+            np.save(f, np.asarray(storage["matrix"], dtype=np.float32))
+        meta = {
+            "embedding_dim": storage["embedding_dim"],
+            "matrix_version": version,
+            "data": storage["data"],
+        }
+        if "additional_data" in storage:
+            meta["additional_data"] = storage["additional_data"]
+        meta["relation_index"] = {k: sorted(v) for k, v in self._relation_index.items()}
+        # The side file names the matrix file, replacing it commits the save
+        tmp_meta_file_name = self._meta_file_name + ".tmp"
+        write_json(meta, tmp_meta_file_name)
+        os.replace(tmp_meta_file_name, self._meta_file_name)
+        # Processes still mapping the old matrix keep reading the unlinked file
+        old_matrix_file_name = self._matrix_file_name(self._matrix_version)
+        if os.path.exists(old_matrix_file_name):
+            os.remove(old_matrix_file_name)
+        self._matrix_version = version
+
     async def upsert(self, data: dict[str, dict]):
         logger.info(f"Inserting {len(data)} vectors to {self.namespace}")
         if not len(data):
@@ -112,6 +486,9 @@ class NanoVectorDBStorage(BaseVectorStorage):
         if len(embeddings) == len(list_data):
             for i, d in enumerate(list_data):
                 d["__vector__"] = embeddings[i]
+            self._unindex_relations([d["__id__"] for d in list_data])
+            for d in list_data:
+                self._index_relation(d)
             results = self._client.upsert(datas=list_data)
             return results
         else:
@@ -133,45 +510,240 @@ class NanoVectorDBStorage(BaseVectorStorage):
         ]
         return results
 
+    async def query_many(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        if not queries:
+            return []
+        embeddings = await self.embedding_func(queries)
+        storage = self.client_storage
+        if not len(storage["data"]):
+            return [[] for _ in queries]
+        # The stored matrix is already normalized, one product scores all queries
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        scores = embeddings @ storage["matrix"].T
+        k = min(top_k, scores.shape[1])
+        top_index = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, row_index in zip(scores, top_index):
+            row_index = row_index[np.argsort(-row_scores[row_index])]
+            results.append(
+                [
+                    {
+                        **storage["data"][i],
+                        "__metrics__": row_scores[i],
+                        "id": storage["data"][i]["__id__"],
+                        "distance": row_scores[i],
+                    }
+                    for i in row_index
+                    if row_scores[i] >= self.cosine_better_than_threshold
+                ]
+            )
+        return results
+
     @property
     def client_storage(self):
         return getattr(self._client, "_NanoVectorDB__storage")
 
+    def _index_relation(self, dp: dict):
+        for key in ("src_id", "tgt_id"):
+            if dp.get(key) is not None:
+                self._relation_index.setdefault(dp[key], set()).add(dp["__id__"])
+                self._relation_names.setdefault(dp["__id__"], set()).add(dp[key])
+
+    def _unindex_relations(self, ids: list[str]):
+        for id_ in ids:
+            for entity_name in self._relation_names.pop(id_, ()):
+                self._relation_index[entity_name].discard(id_)
+                if not self._relation_index[entity_name]:
+                    del self._relation_index[entity_name]
+
+    def _delete(self, ids: list[str]):
+        self._client.delete(ids)
+        self._unindex_relations(ids)
+
     async def delete_entity(self, entity_name: str):
-        try:
-            entity_id = [compute_mdhash_id(entity_name, prefix="ent-")]
+        await self.delete_entities([entity_name])
 
-            if self._client.get(entity_id):
-                self._client.delete(entity_id)
-                logger.info(f"Entity {entity_name} have been deleted.")
+    async def delete_entities(self, entity_names: list[str]):
+        """Delete the records of all given entities in a single pass"""
+        try:
+            # delete skips unknown ids, the size tells how many were found
+            size = len(self.client_storage["data"])
+            self._delete(
+                [
+                    compute_mdhash_id(entity_name, prefix="ent-")
+                    for entity_name in entity_names
+                ]
+            )
+            if len(self.client_storage["data"]) < size:
+                logger.info(f"Entities {entity_names} have been deleted.")
             else:
-                logger.info(f"No entity found with name {entity_name}.")
+                logger.info(f"No entity found with names {entity_names}.")
         except Exception as e:
-            logger.error(f"Error while deleting entity {entity_name}: {e}")
+            logger.error(f"Error while deleting entities {entity_names}: {e}")
 
     async def delete_relation(self, entity_name: str):
+        await self.delete_relations([entity_name])
+
+    async def delete_relations(self, entity_names: list[str]):
+        """Delete the records of all given entities in a single pass"""
         try:
-            relations = [
-                dp
-                for dp in self.client_storage["data"]
-                if dp["src_id"] == entity_name or dp["tgt_id"] == entity_name
-            ]
-            ids_to_delete = [relation["__id__"] for relation in relations]
+            ids_to_delete = set()
+            for entity_name in entity_names:
+                ids_to_delete |= self._relation_index.get(entity_name, set())
 
             if ids_to_delete:
-                self._client.delete(ids_to_delete)
+                self._delete(list(ids_to_delete))
                 logger.info(
-                    f"All relations related to entity {entity_name} have been deleted."
+                    f"All relations related to entities {entity_names} have been deleted."
                 )
             else:
-                logger.info(f"No relations found for entity {entity_name}.")
+                logger.info(f"No relations found for entities {entity_names}.")
         except Exception as e:
             logger.error(
-                f"Error while deleting relations for entity {entity_name}: {e}"
+                f"Error while deleting relations for entities {entity_names}: {e}"
             )
 
     async def index_done_callback(self):
-        self._client.save()
+        self._save_binary()
+
+
+def _encode_strings(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Pack strings into one utf-8 blob plus character offsets"""
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in strings], out=offsets[1:])
+    blob = np.frombuffer("".join(strings).encode("utf-8"), dtype=np.uint8)
+    return blob, offsets
+
+
+def _decode_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    text = blob.tobytes().decode("utf-8")
+    offsets = offsets.tolist()
+    return [text[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def _encode_column(values: list) -> tuple[str, dict[str, np.ndarray]]:
+    """Store one attribute column, ``None`` marks rows without the attribute"""
+    mask = np.array([v is not None for v in values], dtype=bool)
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, str) for v in present):
+        kind = "str"
+    elif all(isinstance(v, bool) for v in present):
+        kind = "bool"
+    elif all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        kind = "int"
+    elif all(isinstance(v, float) for v in present):
+        kind = "float"
+    else:
+        kind = "json"
+
+    if kind in ("str", "json"):
+        dump = (lambda v: v) if kind == "str" else json.dumps
+        blob, offsets = _encode_strings(
+            [dump(v) if v is not None else "" for v in values]
+        )
+        return kind, {"mask": mask, "blob": blob, "offsets": offsets}
+    dtype = {"bool": bool, "int": np.int64, "float": np.float64}[kind]
+    fill = {"bool": False, "int": 0, "float": 0.0}[kind]
+    return kind, {
+        "mask": mask,
+        "values": np.array([v if v is not None else fill for v in values], dtype=dtype),
+    }
+
+
+def _decode_column(kind: str, arrays: dict[str, np.ndarray]) -> list:
+    if kind in ("str", "json"):
+        values = _decode_strings(arrays["blob"], arrays["offsets"])
+        if kind == "json":
+            values = [json.loads(v) if v else None for v in values]
+    else:
+        values = arrays["values"].tolist()
+    return [
+        v if present else None for v, present in zip(values, arrays["mask"].tolist())
+    ]
+
+
+def graph_snapshot_from_nx(graph: nx.Graph) -> dict:
+    """Turn a networkx graph into the columns ``read_graph_snapshot`` returns"""
+    nodes = list(graph.nodes(data=True))
+    position = {node: i for i, (node, _) in enumerate(nodes)}
+    edges = list(graph.edges(data=True))
+    snapshot = {
+        "directed": graph.is_directed(),
+        "graph": graph.graph,
+        "nodes": [str(node) for node, _ in nodes],
+        "edge_src": np.array([position[u] for u, _, _ in edges], dtype=np.int64),
+        "edge_dst": np.array([position[v] for _, v, _ in edges], dtype=np.int64),
+    }
+    for prefix, rows in [
+        ("node", [d for _, d in nodes]),
+        ("edge", [d for *_, d in edges]),
+    ]:
+        keys = dict.fromkeys(k for d in rows for k in d)
+        snapshot[f"{prefix}_attrs"] = {key: [d.get(key) for d in rows] for key in keys}
+    return snapshot
+
+
+def write_graph_snapshot(graph: nx.Graph, file_name: str):
+    """Write a graph as flat numpy arrays in one uncompressed .npz file.
+
+    Node names and string attributes are utf-8 blobs with offsets, edges are
+    two arrays of node positions and every attribute is a column with a
+    presence mask, so loading needs no per-element parsing.
+    """
+    snapshot = graph_snapshot_from_nx(graph)
+    arrays = {}
+    arrays["node_blob"], arrays["node_offsets"] = _encode_strings(snapshot["nodes"])
+    arrays["edge_src"] = snapshot["edge_src"]
+    arrays["edge_dst"] = snapshot["edge_dst"]
+
+    columns = {"node": {}, "edge": {}}
+    for prefix in ["node", "edge"]:
+        for i, (key, values) in enumerate(snapshot[f"{prefix}_attrs"].items()):
+            kind, column = _encode_column(values)
+            columns[prefix][key] = kind
+            for name, array in column.items():
+                arrays[f"{prefix}_{i}_{name}"] = array
+    header = {
+        "directed": snapshot["directed"],
+        "graph": snapshot["graph"],
+        "columns": columns,
+    }
+    arrays["header"] = np.array(json.dumps(header, ensure_ascii=False))
+
+    tmp_file_name = file_name + ".tmp"
+    with open(tmp_file_name, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_file_name, file_name)
+
+
+def read_graph_snapshot(file_name: str) -> Union[dict, None]:
+    """Read a file written by ``write_graph_snapshot`` into plain columns:
+    ``nodes`` (names), ``graph`` (graph attributes), ``edge_src``/``edge_dst``
+    (node positions) and ``node_attrs``/``edge_attrs`` (attribute name ->
+    values, ``None`` where unset).
+    """
+    if not os.path.exists(file_name):
+        return None
+    with np.load(file_name) as arrays:
+        header = json.loads(arrays["header"].item())
+        snapshot = {
+            "directed": header["directed"],
+            "graph": header["graph"],
+            "nodes": _decode_strings(arrays["node_blob"], arrays["node_offsets"]),
+            "edge_src": arrays["edge_src"],
+            "edge_dst": arrays["edge_dst"],
+        }
+        for prefix in ["node", "edge"]:
+            attrs = {}
+            for i, (key, kind) in enumerate(header["columns"][prefix].items()):
+                column = {
+                    name[len(f"{prefix}_{i}_") :]: arrays[name]
+                    for name in arrays.files
+                    if name.startswith(f"{prefix}_{i}_")
+                }
+                attrs[key] = _decode_column(kind, column)
+            snapshot[f"{prefix}_attrs"] = attrs
+    return snapshot
 
 
 @dataclass
@@ -189,6 +761,40 @@ class NetworkXStorage(BaseGraphStorage):
         )
         nx.write_graphml(graph, file_name)
 
+    @staticmethod
+    def load_nx_graph_snapshot(file_name) -> nx.Graph:
+        snapshot = read_graph_snapshot(file_name)
+        if snapshot is None:
+            return None
+        nodes = snapshot["nodes"]
+        node_data = [{} for _ in nodes]
+        for key, values in snapshot["node_attrs"].items():
+            for data, value in zip(node_data, values):
+                if value is not None:
+                    data[key] = value
+        edge_data = [{} for _ in range(len(snapshot["edge_src"]))]
+        for key, values in snapshot["edge_attrs"].items():
+            for data, value in zip(edge_data, values):
+                if value is not None:
+                    data[key] = value
+        graph = nx.DiGraph() if snapshot["directed"] else nx.Graph()
+        graph.graph.update(snapshot["graph"])
+        graph.add_nodes_from(zip(nodes, node_data))
+        graph.add_edges_from(
+            (nodes[u], nodes[v], data)
+            for u, v, data in zip(
+                snapshot["edge_src"].tolist(), snapshot["edge_dst"].tolist(), edge_data
+            )
+        )
+        return graph
+
+    @staticmethod
+    def write_nx_graph_snapshot(graph: nx.Graph, file_name):
+        logger.info(
+            f"Writing graph snapshot with {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges"
+        )
+        write_graph_snapshot(graph, file_name)
+
     @staticmethod
     def stable_largest_connected_component(graph: nx.Graph) -> nx.Graph:
         """Refer to https://github.com/microsoft/graphrag/index/graph/utils/stable_lcc.py
@@ -241,10 +847,18 @@ class NetworkXStorage(BaseGraphStorage):
         self._graphml_xml_file = os.path.join(
             self.global_config["working_dir"], f"graph_{self.namespace}.graphml"
         )
-        preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
+        self._snapshot_file = os.path.join(
+            self.global_config["working_dir"], f"graph_{self.namespace}.npz"
+        )
+        preloaded_file = self._snapshot_file
+        preloaded_graph = NetworkXStorage.load_nx_graph_snapshot(self._snapshot_file)
+        if preloaded_graph is None:
+            # Graphs saved before the snapshot format only exist as GraphML
+            preloaded_file = self._graphml_xml_file
+            preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
         if preloaded_graph is not None:
             logger.info(
-                f"Loaded graph from {self._graphml_xml_file} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
+                f"Loaded graph from {preloaded_file} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
             )
         self._graph = preloaded_graph or nx.Graph()
         self._node_embed_algorithms = {
@@ -252,7 +866,11 @@ class NetworkXStorage(BaseGraphStorage):
         }
 
     async def index_done_callback(self):
-        NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
+        NetworkXStorage.write_nx_graph_snapshot(self._graph, self._snapshot_file)
+
+    def export_graphml(self, file_name: str = None):
+        """Write the graph as GraphML, by default to graph_{namespace}.graphml"""
+        NetworkXStorage.write_nx_graph(self._graph, file_name or self._graphml_xml_file)
 
     async def has_node(self, node_id: str) -> bool:
         return self._graph.has_node(node_id)
@@ -279,6 +897,28 @@ class NetworkXStorage(BaseGraphStorage):
             return list(self._graph.edges(source_node_id))
         return None
 
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        return [self._graph.nodes.get(node_id) for node_id in node_ids]
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        return [self._graph.degree(node_id) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return [self._graph.edges.get(pair) for pair in edge_pairs]
+
+    async def edge_degrees(self, edge_pairs: list[tuple[str, str]]) -> list[int]:
+        return [self._graph.degree(s) + self._graph.degree(t) for s, t in edge_pairs]
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[Union[list[tuple[str, str]], None]]:
+        return [
+            list(self._graph.edges(node_id)) if self._graph.has_node(node_id) else None
+            for node_id in node_ids
+        ]
+
     async def upsert_node(self, node_id: str, node_data: dict[str, str]):
         self._graph.add_node(node_id, **node_data)
 
@@ -287,6 +927,12 @@ class NetworkXStorage(BaseGraphStorage):
     ):
         self._graph.add_edge(source_node_id, target_node_id, **edge_data)
 
+    async def upsert_nodes(self, nodes: list[tuple[str, dict[str, str]]]):
+        self._graph.add_nodes_from(nodes)
+
+    async def upsert_edges(self, edges: list[tuple[str, str, dict[str, str]]]):
+        self._graph.add_edges_from(edges)
+
     async def delete_node(self, node_id: str):
         """
         Delete a node from the graph based on the specified node_id.
@@ -315,3 +961,162 @@ class NetworkXStorage(BaseGraphStorage):
 
         nodes_ids = [self._graph.nodes[node_id]["id"] for node_id in nodes]
         return embeddings, nodes_ids
+
+
+class _InternedColumn:
+    """Attribute column, string columns are stored as integer codes into a
+    table of their distinct values"""
+
+    def __init__(self, values: list):
+        if not all(v is None or isinstance(v, str) for v in values):
+            self.values, self.codes = values, None
+            return
+        table = {}
+        codes = [table.setdefault(v, len(table)) for v in values]
+        self.values = list(table)
+        self.codes = np.array(codes, dtype=np.int32)
+
+    def __getitem__(self, i: int):
+        return self.values[i] if self.codes is None else self.values[self.codes[i]]
+
+
+@dataclass
+class CSRGraphStorage(BaseGraphStorage):
+    """Read-only graph for query serving, loaded from a NetworkXStorage save.
+
+    Nodes are integers, adjacency is CSR (``indptr``/``indices`` with the edge
+    id of every entry, rows sorted by neighbor), degrees are precomputed and
+    attributes are interned columns, so neighbor expansion is an array slice.
+    The graph is treated as undirected like NetworkXStorage.
+    """
+
+    def __post_init__(self):
+        snapshot_file = os.path.join(
+            self.global_config["working_dir"], f"graph_{self.namespace}.npz"
+        )
+        snapshot = read_graph_snapshot(snapshot_file)
+        if snapshot is None:
+            graph = NetworkXStorage.load_nx_graph(
+                os.path.join(
+                    self.global_config["working_dir"], f"graph_{self.namespace}.graphml"
+                )
+            )
+            snapshot = graph_snapshot_from_nx(
+                graph if graph is not None else nx.Graph()
+            )
+        self._load_snapshot(snapshot)
+        logger.info(
+            f"Loaded CSR graph {self.namespace} with {len(self._names)} nodes, {len(self._edge_src)} edges"
+        )
+
+    def _load_snapshot(self, snapshot: dict):
+        self._names = snapshot["nodes"]
+        self._ids = {name: i for i, name in enumerate(self._names)}
+        n = len(self._names)
+        src, dst = snapshot["edge_src"], snapshot["edge_dst"]
+        self._edge_src, self._edge_dst = src, dst
+        edge_ids = np.arange(len(src), dtype=np.int64)
+        # Both directions of every edge, a self-loop only once
+        not_loop = src != dst
+        rows = np.concatenate([src, dst[not_loop]])
+        cols = np.concatenate([dst, src[not_loop]])
+        entry_edges = np.concatenate([edge_ids, edge_ids[not_loop]])
+        order = np.lexsort((cols, rows))
+        self._indices = cols[order]
+        self._entry_edges = entry_edges[order]
+        self._indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self._indptr[1:])
+        # networkx counts a self-loop twice
+        self._degrees = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+        self._node_attrs = {
+            key: _InternedColumn(values)
+            for key, values in snapshot["node_attrs"].items()
+        }
+        self._edge_attrs = {
+            key: _InternedColumn(values)
+            for key, values in snapshot["edge_attrs"].items()
+        }
+
+    def _edge_id(self, source_node_id: str, target_node_id: str) -> Union[int, None]:
+        u = self._ids.get(source_node_id)
+        v = self._ids.get(target_node_id)
+        if u is None or v is None:
+            return None
+        start, end = self._indptr[u], self._indptr[u + 1]
+        i = start + np.searchsorted(self._indices[start:end], v)
+        if i < end and self._indices[i] == v:
+            return int(self._entry_edges[i])
+        return None
+
+    @staticmethod
+    def _row(columns: dict[str, _InternedColumn], i: int) -> dict:
+        row = {}
+        for key, column in columns.items():
+            value = column[i]
+            if value is not None:
+                row[key] = value
+        return row
+
+    async def has_node(self, node_id: str) -> bool:
+        return node_id in self._ids
+
+    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+        return self._edge_id(source_node_id, target_node_id) is not None
+
+    async def get_node(self, node_id: str) -> Union[dict, None]:
+        i = self._ids.get(node_id)
+        if i is None:
+            return None
+        return self._row(self._node_attrs, i)
+
+    async def node_degree(self, node_id: str) -> int:
+        i = self._ids.get(node_id)
+        return 0 if i is None else int(self._degrees[i])
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return await self.node_degree(src_id) + await self.node_degree(tgt_id)
+
+    async def get_edge(
+        self, source_node_id: str, target_node_id: str
+    ) -> Union[dict, None]:
+        edge_id = self._edge_id(source_node_id, target_node_id)
+        if edge_id is None:
+            return None
+        return self._row(self._edge_attrs, edge_id)
+
+    async def get_node_edges(self, source_node_id: str):
+        i = self._ids.get(source_node_id)
+        if i is None:
+            return None
+        neighbors = self._indices[self._indptr[i] : self._indptr[i + 1]]
+        return [(source_node_id, self._names[j]) for j in neighbors.tolist()]
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        return [await self.get_node(node_id) for node_id in node_ids]
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        return [await self.node_degree(node_id) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return [await self.get_edge(s, t) for s, t in edge_pairs]
+
+    async def edge_degrees(self, edge_pairs: list[tuple[str, str]]) -> list[int]:
+        return [await self.edge_degree(s, t) for s, t in edge_pairs]
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[Union[list[tuple[str, str]], None]]:
+        return [await self.get_node_edges(node_id) for node_id in node_ids]
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]):
+        raise NotImplementedError("CSRGraphStorage is read-only")
+
+    async def upsert_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ):
+        raise NotImplementedError("CSRGraphStorage is read-only")
+
+    async def delete_node(self, node_id: str):
+        raise NotImplementedError("CSRGraphStorage is read-only")
@@ -1,13 +1,17 @@
 import asyncio
+import contextvars
 import html
+import inspect
 import io
 import csv
 import json
 import logging
 import os
 import re
+import time
+from collections import defaultdict, deque
 from dataclasses import dataclass
-from functools import wraps
+from functools import lru_cache, wraps
 from hashlib import md5
 from typing import Any, Union, List, Optional
 import xml.etree.ElementTree as ET
@@ -111,23 +115,362 @@ def compute_mdhash_id(content, prefix: str = ""):
     return prefix + md5(content.encode()).hexdigest()
 
 
+class AsyncLimiter:
+    """Limit the number of concurrent holders, admitting waiters in FIFO order.
+
+    Waiters park on plain futures of the running loop instead of an
+    asyncio.Semaphore, so one limiter is not bound to a single event loop.
+    A released slot is handed directly to the oldest waiter.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def stats(self) -> dict:
+        return {
+            "max_size": self.max_size,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "acquired": self._acquired,
+            "total_wait": self._total_wait,
+            "mean_wait": self._total_wait / self._acquired if self._acquired else 0.0,
+            "max_wait": self._max_wait,
+        }
+
+    async def acquire(self):
+        start = time.monotonic()
+        if self._in_flight < self.max_size and not self._waiters:
+            self._in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # the slot was already handed over, pass it on
+                    self.release()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        waited = time.monotonic() - start
+        self._acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class _LimitedStream:
+    """Async iterator holding a limiter slot until the stream is done.
+
+    The slot is released when the stream is exhausted, raises, is closed with
+    ``aclose`` or is garbage collected without being read to the end.
+    """
+
+    def __init__(self, stream, limiter: AsyncLimiter):
+        self._stream = stream
+        self._limiter = limiter
+        self._released = False
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._limiter.release()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            self._release()
+            raise
+
+    async def aclose(self):
+        self._release()
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+    def __del__(self):
+        self._release()
+
+
 def limit_async_func_call(max_size: int, waitting_time: float = 0.0001):
-    """Add restriction of maximum async calling times for a async func"""
+    """Add restriction of maximum async calling times for a async func
+
+    The wrapped function exposes its AsyncLimiter as ``.limiter``;
+    ``waitting_time`` is no longer used and only kept for compatibility.
+    A streamed result keeps its slot until the stream is read or closed.
+    """
 
     def final_decro(func):
-        """Not using async.Semaphore to aovid use nest-asyncio"""
-        __current_size = 0
+        limiter = AsyncLimiter(max_size)
 
         @wraps(func)
         async def wait_func(*args, **kwargs):
-            nonlocal __current_size
-            while __current_size >= max_size:
-                await asyncio.sleep(waitting_time)
-            __current_size += 1
-            result = await func(*args, **kwargs)
-            __current_size -= 1
+            await limiter.acquire()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                limiter.release()
+                raise
+            if hasattr(result, "__aiter__"):
+                return _LimitedStream(result, limiter)
+            limiter.release()
             return result
 
+        wait_func.limiter = limiter
+        return wait_func
+
+    return final_decro
+
+
+# Quota a bucket holds at most, in seconds of its rate, so neither a cold
+# start nor an idle spell releases a minute of calls at once
+_RATE_LIMIT_BURST_SECONDS = 1.0
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.level = 0.0
+        self.set_limit(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        # quota taken so far, to tell which calls a provider header counts
+        self.taken = 0.0
+
+    def set_limit(self, per_minute: float):
+        self.limit = per_minute
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * _RATE_LIMIT_BURST_SECONDS)
+        self.level = min(self.level, self.capacity)
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        # a call larger than the bucket leaves it in debt, later calls wait
+        # for the refill so the rate over a minute still holds
+        self.level -= amount
+        self.taken += amount
+
+    def give_back(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+        self.taken -= amount
+
+
+def _parse_reset_seconds(value: str) -> float:
+    """Parse durations like ``1m30s``, ``6.5s`` or ``20ms`` of rate limit headers"""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(
+        float(number) * units[unit]
+        for number, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    )
+
+
+class RateLimiter:
+    """Pace calls to requests-per-minute and tokens-per-minute quotas.
+
+    Each quota is a token bucket refilled continuously at limit / 60 per
+    second that holds at most ``_RATE_LIMIT_BURST_SECONDS`` of quota; callers
+    are served in FIFO order. ``update_from_headers`` adopts the limits the
+    provider reports in ``x-ratelimit-*`` headers and reconciles the buckets
+    with the remaining quota.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self._requests = _TokenBucket(rpm) if rpm else None
+        self._tokens = _TokenBucket(tpm) if tpm else None
+        self._fifo = AsyncLimiter(1)
+
+    def _buckets(self, tokens: int) -> list[tuple[_TokenBucket, float]]:
+        return [
+            (bucket, amount)
+            for bucket, amount in [(self._requests, 1), (self._tokens, tokens)]
+            if bucket is not None
+        ]
+
+    async def acquire(self, tokens: int = 0) -> list[float]:
+        """Wait for the quota of a call and take it.
+
+        Returns the ``taken`` totals of the buckets right after, which
+        ``update_from_headers`` needs to discount calls sent later.
+        """
+        async with self._fifo:
+            buckets = self._buckets(tokens)
+            while True:
+                now = time.monotonic()
+                for bucket, _ in buckets:
+                    bucket.refill(now)
+                wait = max([bucket.wait_time(amount) for bucket, amount in buckets])
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            for bucket, amount in buckets:
+                bucket.take(amount)
+            return [bucket.taken for bucket, _ in buckets]
+
+    def refund(self, tokens: int = 0):
+        """Return the quota of a call that never reached the provider"""
+        for bucket, amount in self._buckets(tokens):
+            bucket.give_back(amount)
+
+    def update_from_headers(self, headers, marks: list[float] = None):
+        """Adopt the limits and remaining quota a provider reports.
+
+        ``marks`` are the totals ``acquire`` returned for the call the headers
+        answer. Its own quota and the quota of earlier calls are already in
+        the provider's remaining count, calls taken after it are not yet.
+        """
+        now = time.monotonic()
+        buckets = [
+            (bucket, kind)
+            for bucket, kind in [(self._requests, "requests"), (self._tokens, "tokens")]
+            if bucket is not None
+        ]
+        for i, (bucket, kind) in enumerate(buckets):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = headers.get(f"x-ratelimit-reset-{kind}")
+            try:
+                bucket.refill(now)
+                if limit is not None and float(limit) > 0:
+                    bucket.set_limit(float(limit))
+                if remaining is None:
+                    continue
+                remaining = float(remaining)
+                sent_since = bucket.taken - marks[i] if marks else 0.0
+                available = remaining - sent_since
+                bucket.rate = bucket.limit / 60
+                if reset is not None and available < bucket.level:
+                    # the provider refills to its limit by the reset time
+                    reset_seconds = _parse_reset_seconds(reset)
+                    if reset_seconds > 0 and remaining < bucket.limit:
+                        bucket.rate = min(
+                            bucket.limit / 60,
+                            (bucket.limit - remaining) / reset_seconds,
+                        )
+                bucket.level = min(bucket.capacity, available)
+            except ValueError:
+                logger.debug(f"Ignore malformed rate limit headers for {kind}")
+
+
+_current_rate_limited_call = contextvars.ContextVar(
+    "current_rate_limited_call", default=None
+)
+
+
+class _RateLimitedCall:
+    """Quota taken by the call a ``limit_async_func_rate`` wrapper runs"""
+
+    def __init__(self, rate_limiter: "RateLimiter", tokens: int, marks: list[float]):
+        self.rate_limiter = rate_limiter
+        self.tokens = tokens
+        self.marks = marks
+        self.attempts = 0
+
+
+def report_rate_limit_headers(headers):
+    """Feed provider rate limit headers to the RateLimiter pacing this call"""
+    current = _current_rate_limited_call.get()
+    if current is not None:
+        current.rate_limiter.update_from_headers(headers, current.marks)
+
+
+def refund_rate_limit():
+    """Give back the quota of the current call, e.g. on a cache hit"""
+    current = _current_rate_limited_call.get()
+    if current is not None:
+        current.rate_limiter.refund(current.tokens)
+
+
+async def pace_rate_limited_attempt():
+    """Take quota again when a rate limited call is retried.
+
+    Await it first thing in a function retried inside the rate limited
+    wrapper. The wrapper paid for the first attempt, every further attempt
+    waits for and takes the call's quota once more.
+    """
+    current = _current_rate_limited_call.get()
+    if current is None:
+        return
+    if current.attempts:
+        current.marks = await current.rate_limiter.acquire(current.tokens)
+    current.attempts += 1
+
+
+def count_llm_call_tokens(prompt, system_prompt=None, history_messages=[], **kwargs):
+    """Estimate the tokens a completion call counts against a TPM quota"""
+    texts = [prompt or "", system_prompt or ""]
+    texts.extend(message["content"] for message in history_messages)
+    return sum(len(encode_string_by_tiktoken(text)) for text in texts) + (
+        kwargs.get("max_tokens") or 0
+    )
+
+
+def count_embedding_call_tokens(texts, *args, **kwargs):
+    """Estimate the tokens an embedding call counts against a TPM quota"""
+    return sum(len(encode_string_by_tiktoken(text)) for text in texts)
+
+
+def limit_async_func_rate(rpm: int, tpm: int, count_tokens: callable):
+    """Pace an async func to ``rpm`` requests and ``tpm`` tokens per minute
+
+    ``count_tokens`` estimates the tokens of a call from its arguments. A
+    zero limit is not enforced and the func is returned as is when both are
+    zero. The wrapped function exposes its RateLimiter as ``.rate_limiter``.
+    """
+
+    def final_decro(func):
+        if not rpm and not tpm:
+            return func
+        rate_limiter = RateLimiter(rpm, tpm)
+
+        @wraps(func)
+        async def wait_func(*args, **kwargs):
+            tokens = count_tokens(*args, **kwargs) if tpm else 0
+            marks = await rate_limiter.acquire(tokens)
+            current = _current_rate_limited_call.set(
+                _RateLimitedCall(rate_limiter, tokens, marks)
+            )
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_rate_limited_call.reset(current)
+
+        wait_func.rate_limiter = rate_limiter
         return wait_func
 
     return final_decro
@@ -171,6 +514,29 @@ def decode_tokens_by_tiktoken(tokens: list[int], model_name: str = "gpt-4o"):
     return content
 
 
+@lru_cache(maxsize=8192)
+def count_tokens_by_tiktoken(content: str, model_name: str = "gpt-4o") -> int:
+    """Token length of a string, memoized for strings measured repeatedly"""
+    return len(encode_string_by_tiktoken(content, model_name=model_name))
+
+
+def encode_strings_by_tiktoken(contents: list[str], model_name: str = "gpt-4o"):
+    """Encode many strings at once, tiktoken spreads the batch over threads"""
+    global ENCODER
+    if ENCODER is None:
+        ENCODER = tiktoken.encoding_for_model(model_name)
+    return ENCODER.encode_batch(contents)
+
+
+def decode_tokens_batch_by_tiktoken(
+    tokens_list: list[list[int]], model_name: str = "gpt-4o"
+):
+    global ENCODER
+    if ENCODER is None:
+        ENCODER = tiktoken.encoding_for_model(model_name)
+    return ENCODER.decode_batch(tokens_list)
+
+
 def pack_user_ass_to_openai_messages(*args: str):
     roles = ["user", "assistant"]
     return [
@@ -178,14 +544,41 @@ def pack_user_ass_to_openai_messages(*args: str):
     ]
 
 
+@lru_cache(maxsize=None)
+def _compile_markers(markers: tuple[str, ...]) -> re.Pattern:
+    return re.compile("|".join(re.escape(marker) for marker in markers))
+
+
 def split_string_by_multi_markers(content: str, markers: list[str]) -> list[str]:
     """Split a string by multiple markers"""
     if not markers:
         return [content]
-    results = re.split("|".join(re.escape(marker) for marker in markers), content)
+    results = _compile_markers(tuple(markers)).split(content)
     return [r.strip() for r in results if r.strip()]
 
 
+class RecordStreamParser:
+    """Split streamed text into records as soon as each one is complete.
+
+    ``feed`` returns the records closed by a marker in the text received so
+    far and keeps the unfinished tail, which may end in part of a marker.
+    ``close`` returns that tail as the last record. Feeding a text in pieces
+    gives the same records as ``split_string_by_multi_markers`` on the whole.
+    """
+
+    def __init__(self, markers: list[str]):
+        self._pattern = _compile_markers(tuple(markers))
+        self._tail = ""
+
+    def feed(self, text: str) -> list[str]:
+        *records, self._tail = self._pattern.split(self._tail + text)
+        return [r.strip() for r in records if r.strip()]
+
+    def close(self) -> list[str]:
+        tail, self._tail = self._tail.strip(), ""
+        return [tail] if tail else []
+
+
 # Refer the utils functions of the official GraphRAG implementation:
 # https://github.com/microsoft/graphrag
 def clean_str(input: Any) -> str:
@@ -203,13 +596,22 @@ def is_float_regex(value):
     return bool(re.match(r"^[-+]?[0-9]*\.?[0-9]+$", value))
 
 
-def truncate_list_by_token_size(list_data: list, key: callable, max_token_size: int):
-    """Truncate a list of data by token size"""
+def truncate_list_by_token_size(
+    list_data: list, key: callable, max_token_size: int, token_count: callable = None
+):
+    """Truncate a list of data by token size
+
+    ``token_count`` may return the stored token length of an item, items where
+    it returns None are measured from ``key``.
+    """
     if max_token_size <= 0:
         return []
     tokens = 0
     for i, data in enumerate(list_data):
-        tokens += len(encode_string_by_tiktoken(key(data)))
+        n_tokens = token_count(data) if token_count is not None else None
+        if n_tokens is None:
+            n_tokens = count_tokens_by_tiktoken(key(data))
+        tokens += n_tokens
         if tokens > max_token_size:
             return list_data[:i]
     return list_data
@@ -330,6 +732,203 @@ def process_combine_contexts(hl, ll):
     return combined_sources_result
 
 
+def make_cache_key(mode: str, args_hash: str) -> str:
+    """Key of one LLM response cache entry, the mode prefix is the secondary index"""
+    return f"{mode}:{args_hash}"
+
+
+async def get_cache_mode_index(hashing_kv) -> dict[str, set[str]]:
+    """Return the per-mode index of cached args_hash of an LLM response cache.
+
+    The index is rebuilt from the storage keys once per process and kept
+    current by ``save_to_cache``. Building it also migrates the legacy layout,
+    where each mode was a single record holding a dict of all its entries.
+    """
+    index = getattr(hashing_kv, "_cache_mode_index", None)
+    if index is not None:
+        return index
+
+    index = defaultdict(set)
+    legacy_modes = []
+    for key in await hashing_kv.all_keys():
+        mode, sep, args_hash = key.partition(":")
+        if sep:
+            index[mode].add(args_hash)
+        else:
+            legacy_modes.append(key)
+
+    migrated = {}
+    for mode, mode_cache in zip(
+        legacy_modes, await hashing_kv.get_by_ids(legacy_modes)
+    ):
+        for args_hash, entry in (mode_cache or {}).items():
+            if isinstance(entry, dict) and "return" in entry:
+                if args_hash not in index[mode]:
+                    migrated[make_cache_key(mode, args_hash)] = {**entry, "mode": mode}
+                index[mode].add(args_hash)
+    if migrated:
+        logger.info(f"Migrated {len(migrated)} legacy LLM cache entries")
+        await hashing_kv.upsert(migrated)
+    if legacy_modes:
+        # later starts would otherwise load and scan the per-mode dicts again
+        try:
+            await hashing_kv.delete(legacy_modes)
+        except NotImplementedError:
+            logger.warning(
+                f"{type(hashing_kv).__name__} cannot delete keys, "
+                "legacy LLM cache records are kept"
+            )
+        else:
+            await hashing_kv.index_done_callback()
+
+    if getattr(hashing_kv, "_cache_mode_index", None) is None:
+        hashing_kv._cache_mode_index = index
+    return hashing_kv._cache_mode_index
+
+
+class QuantizedEmbeddingIndex:
+    """Cached query embeddings of one mode, kept as a contiguous uint8 matrix.
+
+    Row ``i`` dequantizes to ``codes[i] * scales[i] + offsets[i]``, so the cosine
+    similarity of a query against every row is one matrix-vector product plus
+    per-row corrections. Past ``ann_threshold`` rows an hnswlib index answers
+    the lookup instead, if hnswlib is installed.
+    """
+
+    _block_rows = 4096
+
+    def __init__(self, ann_threshold: int = 10000, ann_ef: int = 64):
+        self.ann_threshold = ann_threshold
+        self.ann_ef = ann_ef
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._codes = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._offsets = np.zeros(0, dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._ann_index = None
+        self._ann_unavailable = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _grow(self, dim: int):
+        capacity = max(1024, 2 * len(self._scales))
+        codes = np.zeros((capacity, dim), dtype=np.uint8)
+        if self._codes is not None:
+            codes[: len(self._ids)] = self._codes[: len(self._ids)]
+        self._codes = codes
+        for name in ["_scales", "_offsets", "_norms"]:
+            column = np.zeros(capacity, dtype=np.float32)
+            column[: len(self._ids)] = getattr(self, name)[: len(self._ids)]
+            setattr(self, name, column)
+
+    def add(self, cache_id: str, quantized: np.ndarray, min_val: float, max_val: float):
+        quantized = np.asarray(quantized, dtype=np.uint8).reshape(-1)
+        if self._codes is not None and quantized.shape[0] != self._codes.shape[1]:
+            logger.warning(f"Skip cached embedding {cache_id} of another dimension")
+            return
+        row = self._rows.get(cache_id)
+        if row is None:
+            if self._codes is None or len(self._ids) == self._codes.shape[0]:
+                self._grow(quantized.shape[0])
+            row = len(self._ids)
+            self._ids.append(cache_id)
+            self._rows[cache_id] = row
+        scale = (max_val - min_val) / 255
+        self._codes[row] = quantized
+        self._scales[row] = scale
+        self._offsets[row] = min_val
+        self._norms[row] = np.linalg.norm(quantized * np.float32(scale) + min_val)
+        if self._ann_index is not None:
+            self._ann_add(np.array([row]))
+
+    def _dequantize(self, rows: np.ndarray) -> np.ndarray:
+        return (
+            self._codes[rows] * self._scales[rows, None] + self._offsets[rows, None]
+        ).astype(np.float32)
+
+    def _ann_add(self, rows: np.ndarray):
+        needed = int(rows.max()) + 1
+        if needed > self._ann_index.get_max_elements():
+            self._ann_index.resize_index(
+                max(needed, 2 * self._ann_index.get_max_elements())
+            )
+        self._ann_index.add_items(self._dequantize(rows), rows)
+
+    def _build_ann_index(self):
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("hnswlib is not installed, semantic cache stays brute force")
+            self._ann_unavailable = True
+            return
+        self._ann_index = hnswlib.Index(space="cosine", dim=self._codes.shape[1])
+        self._ann_index.init_index(max_elements=self._codes.shape[0])
+        self._ann_index.set_ef(self.ann_ef)
+        self._ann_add(np.arange(len(self._ids)))
+        logger.info(f"Built ANN index over {len(self._ids)} cached embeddings")
+
+    def best_match(self, query: np.ndarray) -> tuple[Union[str, None], float]:
+        """Return the id and cosine similarity of the closest cached embedding"""
+        n = len(self._ids)
+        if n == 0:
+            return None, -1.0
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        query_norm = np.linalg.norm(query)
+        if query.shape[0] != self._codes.shape[1] or query_norm == 0:
+            return None, -1.0
+        if (
+            self._ann_index is None
+            and not self._ann_unavailable
+            and self.ann_threshold
+            and n >= self.ann_threshold
+        ):
+            self._build_ann_index()
+        if self._ann_index is not None:
+            labels, distances = self._ann_index.knn_query(query, k=1)
+            return self._ids[int(labels[0][0])], float(1 - distances[0][0])
+
+        dots = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self._block_rows):
+            stop = min(start + self._block_rows, n)
+            dots[start:stop] = self._codes[start:stop] @ query
+        similarities = (
+            dots * self._scales[:n] + self._offsets[:n] * query.sum()
+        ) / np.maximum(self._norms[:n] * query_norm, 1e-12)
+        best = int(np.argmax(similarities))
+        return self._ids[best], float(similarities[best])
+
+
+async def get_cache_embedding_index(
+    hashing_kv, mode: str, ann_threshold: int = 10000, ann_ef: int = 64
+) -> QuantizedEmbeddingIndex:
+    """Return the embedding index of one mode, loaded from storage on first use"""
+    indexes = getattr(hashing_kv, "_cache_embedding_indexes", None)
+    if indexes is None:
+        indexes = hashing_kv._cache_embedding_indexes = {}
+    if mode in indexes:
+        return indexes[mode]
+
+    cache_ids = list((await get_cache_mode_index(hashing_kv))[mode])
+    # Project the embeddings only, the cached answers stay on storage
+    embeddings = await hashing_kv.get_by_ids(
+        [make_cache_key(mode, cache_id) for cache_id in cache_ids],
+        fields={"embedding", "embedding_min", "embedding_max"},
+    )
+    index = QuantizedEmbeddingIndex(ann_threshold=ann_threshold, ann_ef=ann_ef)
+    for cache_id, cache_data in zip(cache_ids, embeddings):
+        if cache_data is None or cache_data.get("embedding") is None:
+            continue
+        index.add(
+            cache_id,
+            np.frombuffer(bytes.fromhex(cache_data["embedding"]), dtype=np.uint8),
+            cache_data["embedding_min"],
+            cache_data["embedding_max"],
+        )
+    return indexes.setdefault(mode, index)
+
+
 async def get_best_cached_response(
     hashing_kv,
     current_embedding,
@@ -338,84 +937,65 @@ async def get_best_cached_response(
     use_llm_check=False,
     llm_func=None,
     original_prompt=None,
+    ann_threshold=10000,
 ) -> Union[str, None]:
-    # Get mode-specific cache
-    mode_cache = await hashing_kv.get_by_id(mode)
-    if not mode_cache:
+    # Only look at the cache entries of this mode
+    embedding_index = await get_cache_embedding_index(
+        hashing_kv, mode, ann_threshold=ann_threshold
+    )
+    best_cache_id, best_similarity = embedding_index.best_match(current_embedding)
+    if best_cache_id is None or best_similarity <= similarity_threshold:
         return None
 
-    best_similarity = -1
-    best_response = None
-    best_prompt = None
-    best_cache_id = None
-
-    # Only iterate through cache entries for this mode
-    for cache_id, cache_data in mode_cache.items():
-        if cache_data["embedding"] is None:
-            continue
+    best_entry = await hashing_kv.get_by_id(make_cache_key(mode, best_cache_id))
+    if best_entry is None:
+        return None
+    best_response = best_entry["return"]
+    best_prompt = best_entry["original_prompt"]
 
-        # Convert cached embedding list to ndarray
-        cached_quantized = np.frombuffer(
-            bytes.fromhex(cache_data["embedding"]), dtype=np.uint8
-        ).reshape(cache_data["embedding_shape"])
-        cached_embedding = dequantize_embedding(
-            cached_quantized,
-            cache_data["embedding_min"],
-            cache_data["embedding_max"],
+    # If LLM check is enabled and all required parameters are provided
+    if use_llm_check and llm_func and original_prompt and best_prompt:
+        compare_prompt = PROMPTS["similarity_check"].format(
+            original_prompt=original_prompt, cached_prompt=best_prompt
         )
 
-        similarity = cosine_similarity(current_embedding, cached_embedding)
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_response = cache_data["return"]
-            best_prompt = cache_data["original_prompt"]
-            best_cache_id = cache_id
-
-    if best_similarity > similarity_threshold:
-        # If LLM check is enabled and all required parameters are provided
-        if use_llm_check and llm_func and original_prompt and best_prompt:
-            compare_prompt = PROMPTS["similarity_check"].format(
-                original_prompt=original_prompt, cached_prompt=best_prompt
-            )
-
-            try:
-                llm_result = await llm_func(compare_prompt)
-                llm_result = llm_result.strip()
-                llm_similarity = float(llm_result)
-
-                # Replace vector similarity with LLM similarity score
-                best_similarity = llm_similarity
-                if best_similarity < similarity_threshold:
-                    log_data = {
-                        "event": "llm_check_cache_rejected",
-                        "original_question": original_prompt[:100] + "..."
-                        if len(original_prompt) > 100
-                        else original_prompt,
-                        "cached_question": best_prompt[:100] + "..."
-                        if len(best_prompt) > 100
-                        else best_prompt,
-                        "similarity_score": round(best_similarity, 4),
-                        "threshold": similarity_threshold,
-                    }
-                    logger.info(json.dumps(log_data, ensure_ascii=False))
-                    return None
-            except Exception as e:  # Catch all possible exceptions
-                logger.warning(f"LLM similarity check failed: {e}")
-                return None  # Return None directly when LLM check fails
-
-        prompt_display = (
-            best_prompt[:50] + "..." if len(best_prompt) > 50 else best_prompt
-        )
-        log_data = {
-            "event": "cache_hit",
-            "mode": mode,
-            "similarity": round(best_similarity, 4),
-            "cache_id": best_cache_id,
-            "original_prompt": prompt_display,
-        }
-        logger.info(json.dumps(log_data, ensure_ascii=False))
-        return best_response
-    return None
+        try:
+            llm_result = await llm_func(compare_prompt)
+            llm_result = llm_result.strip()
+            llm_similarity = float(llm_result)
+
+            # Replace vector similarity with LLM similarity score
+            best_similarity = llm_similarity
+            if best_similarity < similarity_threshold:
+                log_data = {
+                    "event": "llm_check_cache_rejected",
+                    "original_question": original_prompt[:100] + "..."
+                    if len(original_prompt) > 100
+                    else original_prompt,
+                    "cached_question": best_prompt[:100] + "..."
+                    if len(best_prompt) > 100
+                    else best_prompt,
+                    "similarity_score": round(best_similarity, 4),
+                    "threshold": similarity_threshold,
+                }
+                logger.info(json.dumps(log_data, ensure_ascii=False))
+                return None
+        except Exception as e:  # Catch all possible exceptions
+            logger.warning(f"LLM similarity check failed: {e}")
+            return None  # Return None directly when LLM check fails
+
+    prompt_display = (
+        best_prompt[:50] + "..." if len(best_prompt) > 50 else best_prompt
+    )
+    log_data = {
+        "event": "cache_hit",
+        "mode": mode,
+        "similarity": round(best_similarity, 4),
+        "cache_id": best_cache_id,
+        "original_prompt": prompt_display,
+    }
+    logger.info(json.dumps(log_data, ensure_ascii=False))
+    return best_response
 
 
 def cosine_similarity(v1, v2):
@@ -454,9 +1034,10 @@ async def handle_cache(hashing_kv, args_hash, prompt, mode="default"):
 
     # For naive mode, only use simple cache matching
     if mode == "naive":
-        mode_cache = await hashing_kv.get_by_id(mode) or {}
-        if args_hash in mode_cache:
-            return mode_cache[args_hash]["return"], None, None, None
+        await get_cache_mode_index(hashing_kv)
+        entry = await hashing_kv.get_by_id(make_cache_key(mode, args_hash))
+        if entry is not None:
+            return entry["return"], None, None, None
         return None, None, None, None
 
     # Get embedding cache configuration
@@ -483,14 +1064,16 @@ async def handle_cache(hashing_kv, args_hash, prompt, mode="default"):
             use_llm_check=use_llm_check,
             llm_func=llm_model_func if use_llm_check else None,
             original_prompt=prompt if use_llm_check else None,
+            ann_threshold=embedding_cache_config.get("ann_threshold", 10000),
         )
         if best_cached_response is not None:
             return best_cached_response, None, None, None
     else:
         # Use regular cache
-        mode_cache = await hashing_kv.get_by_id(mode) or {}
-        if args_hash in mode_cache:
-            return mode_cache[args_hash]["return"], None, None, None
+        await get_cache_mode_index(hashing_kv)
+        entry = await hashing_kv.get_by_id(make_cache_key(mode, args_hash))
+        if entry is not None:
+            return entry["return"], None, None, None
 
     return None, quantized, min_val, max_val
 
@@ -510,22 +1093,119 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
     if hashing_kv is None or hasattr(cache_data.content, "__aiter__"):
         return
 
-    mode_cache = await hashing_kv.get_by_id(cache_data.mode) or {}
-
-    mode_cache[cache_data.args_hash] = {
-        "return": cache_data.content,
-        "embedding": cache_data.quantized.tobytes().hex()
-        if cache_data.quantized is not None
-        else None,
-        "embedding_shape": cache_data.quantized.shape
-        if cache_data.quantized is not None
-        else None,
-        "embedding_min": cache_data.min_val,
-        "embedding_max": cache_data.max_val,
-        "original_prompt": cache_data.prompt,
-    }
+    mode_index = await get_cache_mode_index(hashing_kv)
+    await hashing_kv.upsert(
+        {
+            make_cache_key(cache_data.mode, cache_data.args_hash): {
+                "mode": cache_data.mode,
+                "return": cache_data.content,
+                "embedding": cache_data.quantized.tobytes().hex()
+                if cache_data.quantized is not None
+                else None,
+                "embedding_shape": cache_data.quantized.shape
+                if cache_data.quantized is not None
+                else None,
+                "embedding_min": float(cache_data.min_val)
+                if cache_data.min_val is not None
+                else None,
+                "embedding_max": float(cache_data.max_val)
+                if cache_data.max_val is not None
+                else None,
+                "original_prompt": cache_data.prompt,
+            }
+        }
+    )
+    mode_index[cache_data.mode].add(cache_data.args_hash)
+    embedding_indexes = getattr(hashing_kv, "_cache_embedding_indexes", {})
+    if cache_data.quantized is not None and cache_data.mode in embedding_indexes:
+        embedding_indexes[cache_data.mode].add(
+            cache_data.args_hash,
+            cache_data.quantized,
+            float(cache_data.min_val),
+            float(cache_data.max_val),
+        )
 
-    await hashing_kv.upsert({cache_data.mode: mode_cache})
+
+# call arguments that do not change the completion
+_LLM_CACHE_IGNORED_ARGS = {
+    "hashing_kv",
+    "stream",
+    "api_key",
+    "base_url",
+    "api_version",
+    "host",
+    "timeout",
+    "aws_access_key_id",
+    "aws_secret_access_key",
+    "aws_session_token",
+}
+
+
+def cache_llm_response(func):
+    """Serve an LLM completion function from its ``hashing_kv`` response cache.
+
+    Entries are exact matches in the "default" mode, keyed by the model, the
+    messages and all other call arguments except ``_LLM_CACHE_IGNORED_ARGS``.
+    Streamed responses are passed through and cached once fully consumed, and
+    a hit for a streaming call is replayed as a single chunk.
+    """
+    signature = inspect.signature(func)
+    var_keyword = next(
+        (
+            name
+            for name, param in signature.parameters.items()
+            if param.kind is inspect.Parameter.VAR_KEYWORD
+        ),
+        None,
+    )
+
+    @wraps(func)
+    async def cached_func(*args, **kwargs):
+        hashing_kv = kwargs.get("hashing_kv")
+        if hashing_kv is None:
+            return await func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        call_args = dict(bound.arguments)
+        call_args.update(call_args.pop(var_keyword, {}))
+        args_hash = compute_args_hash(
+            sorted(
+                (k, v) for k, v in call_args.items() if k not in _LLM_CACHE_IGNORED_ARGS
+            )
+        )
+        prompt = call_args.get("prompt")
+
+        await get_cache_mode_index(hashing_kv)
+        entry = await hashing_kv.get_by_id(make_cache_key("default", args_hash))
+        if entry is not None:
+            refund_rate_limit()
+            if kwargs.get("stream"):
+
+                async def replay():
+                    yield entry["return"]
+
+                return replay()
+            return entry["return"]
+
+        response = await func(*args, **kwargs)
+        if hasattr(response, "__aiter__"):
+
+            async def inner():
+                chunks = []
+                async for chunk in response:
+                    chunks.append(chunk)
+                    yield chunk
+                await save_to_cache(
+                    hashing_kv, CacheData(args_hash, "".join(chunks), str(prompt))
+                )
+
+            return inner()
+        if isinstance(response, str):
+            await save_to_cache(hashing_kv, CacheData(args_hash, response, str(prompt)))
+        return response
+
+    return cached_func
 
 
 def safe_unicode_decode(content):